@@ -2,6 +2,6 @@
 AI package for educational assistance
 """
 
-from .assistant import AIAssistant
+from .assistant import AIAssistant, PromptTooLongError
 
-__all__ = ['AIAssistant']
+__all__ = ['AIAssistant', 'PromptTooLongError']
@@ -1,23 +1,222 @@
 import openai
-from openai import OpenAI
-import json
+from openai import AsyncOpenAI
+import asyncio
+import httpx
+import orjson
+import hashlib
+import html
+import re
+import time
+import tiktoken
+from types import MappingProxyType
+from cachetools import TTLCache
 from src.config.settings import settings
-from typing import List, Dict, Any, Optional
+from src.models.schemas import AnalysisRequest
+from typing import List, Dict, Any, Optional, AsyncIterator, Callable
 import logging
 
 logger = logging.getLogger(__name__)
 
+# System messages are shared by reference across requests, so keep them read-only
+_TUTOR_SYSTEM = MappingProxyType({
+    "role": "system",
+    "content": "You are an experienced educator and tutor. Provide helpful, structured guidance without completing the assignment for the student."
+})
+
+_QUESTION_SYSTEM = MappingProxyType({
+    "role": "system",
+    "content": "You are a patient tutor who explains concepts clearly without giving away answers. Encourage learning and understanding."
+})
+
+_NOTES_SYSTEM = MappingProxyType({
+    "role": "system",
+    "content": "You are an expert educator who creates clear, organized, and effective study materials."
+})
+
+_ANALYSIS_SECTIONS = """1. KEY_CONCEPTS: List the main concepts and topics this assignment covers
+2. LEARNING_OBJECTIVES: What the student should learn from this assignment
+3. STEP_BY_STEP_APPROACH: A suggested approach to complete the assignment
+4. COMMON_MISTAKES: Common errors students make with this type of assignment
+5. RESOURCES: Recommended learning resources (books, websites, videos)
+6. TIME_ESTIMATE: Estimated time needed to complete
+7. DIFFICULTY_LEVEL: Easy/Medium/Hard with explanation"""
+
+_ANALYZE_TEMPLATE = """You are an educational assistant that helps students understand assignments without doing the work for them. Analyze this assignment and provide helpful guidance.
+
+ASSIGNMENT: {assignment_description}
+CONTEXT: {context}
+
+Please provide a structured analysis with the following sections:
+
+""" + _ANALYSIS_SECTIONS + """
+
+Return your response as valid JSON with these exact keys."""
+
+_ANALYZE_BATCH_TEMPLATE = """You are an educational assistant that helps students understand assignments without doing the work for them. Analyze each of the following {count} assignments.
+
+{assignments}
+
+For each assignment provide a structured analysis with the following sections:
+
+""" + _ANALYSIS_SECTIONS + """
+
+Return your response as a valid JSON object with a single key "results" holding an array of {count} analysis objects, in the same order as the items above."""
+
+_BATCH_ITEM_TEMPLATE = "ITEM {number}:\nASSIGNMENT: {assignment_description}\nCONTEXT: {context}"
+
+_QUESTION_TEMPLATE = """You are a tutor helping a student understand a {question_type} question without giving away the answer.
+
+QUESTION: {question}
+QUESTION_TYPE: {question_type}
+
+Please provide helpful guidance with the following structure:
+
+1. QUESTION_BREAKDOWN: Explain what the question is asking in simpler terms
+2. KEY_CONCEPTS: List the concepts needed to answer this question
+3. THINKING_PROCESS: Step-by-step approach to solve this type of question
+4. RELATED_EXAMPLES: Similar examples or practice problems
+5. CHECKING_WORK: How to verify the answer is correct
+6. LEARNING_TIPS: Strategies for mastering this type of question
+
+Return your response as valid JSON with these exact keys.
+Do not provide the direct answer to the question."""
+
+_NOTES_TEMPLATE = """Create comprehensive study notes for the following topic:
+
+TOPIC: {topic}
+KEY_POINTS_TO_COVER: {key_points}
+
+Please organize the notes as follows:
+
+1. OVERVIEW: Brief introduction to the topic
+2. KEY_DEFINITIONS: Important terms and definitions
+3. MAIN_CONCEPTS: Core concepts explained clearly
+4. EXAMPLES: Relevant examples and applications
+5. FORMULAS_EQUATIONS: Any important formulas (if applicable)
+6. STUDY_TIPS: Effective ways to study this topic
+7. PRACTICE_SUGGESTIONS: Ideas for practice and application
+
+Return as valid JSON with these exact keys."""
+
+# Tokens reserved for chat message framing and as headroom for the response
+_MESSAGE_TOKEN_OVERHEAD = 4
+_RESPONSE_TOKEN_MARGIN = 64
+_MIN_RESPONSE_TOKENS = 256
+
+# Response tokens requested for one assignment analysis
+_ANALYSIS_MAX_TOKENS = 1500
+
+class PromptTooLongError(ValueError):
+    """Raised when a prompt leaves no room for a response in the model's context window"""
+
+# tiktoken downloads its BPE file on first use, so the encoding is loaded off the event loop
+# by ensure_token_encoding; until then token counts are estimated
+_ENCODING_RETRY_SECONDS = 60
+_encoding = None
+_encoding_attempted_at: Optional[float] = None
+_encoding_lock = asyncio.Lock()
+
+def _load_encoding(model: str):
+    """Load the tiktoken encoding for a model, or None if it cannot be loaded"""
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"Token encoding unavailable, estimating token counts: {e}")
+        return None
+
+async def ensure_token_encoding() -> None:
+    """Load the token encoding in a worker thread, retrying failed loads after a pause"""
+    global _encoding, _encoding_attempted_at
+    
+    def due() -> bool:
+        return _encoding is None and (
+            _encoding_attempted_at is None
+            or time.monotonic() - _encoding_attempted_at >= _ENCODING_RETRY_SECONDS
+        )
+    
+    if not due():
+        return
+    async with _encoding_lock:
+        if due():
+            _encoding_attempted_at = time.monotonic()
+            _encoding = await asyncio.to_thread(_load_encoding, settings.OPENAI_MODEL)
+
+def _count_tokens(text: str) -> int:
+    """Count the tokens in a piece of text for the configured model"""
+    encoding = _encoding
+    if encoding is None:
+        # Roughly four characters per token for English text
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+_INLINE_WHITESPACE_RE = re.compile(r'[ \t\r\f\v]+')
+
+def _compress_prompt_text(text: str, token_budget: int) -> str:
+    """
+    Shrink assignment text before it is sent to the model
+    
+    Strips HTML markup, collapses whitespace and drops repeated lines, then
+    keeps the start and end of the text if it still exceeds the token budget.
+    """
+    if not text:
+        return text
+    
+    text = html.unescape(_HTML_TAG_RE.sub(' ', text))
+    
+    seen = set()
+    lines = []
+    for line in text.splitlines():
+        line = _INLINE_WHITESPACE_RE.sub(' ', line).strip()
+        if line and line not in seen:
+            seen.add(line)
+            lines.append(line)
+    text = "\n".join(lines)
+    
+    tokens = _count_tokens(text)
+    if tokens > token_budget:
+        max_chars = len(text) * token_budget // tokens
+        head_chars = max_chars * 2 // 3
+        text = text[:head_chars] + "\n[...]\n" + text[-(max_chars - head_chars):]
+    
+    return text
+
 class AIAssistant:
     def __init__(self):
         self.client = None
+        self._http = None
         self.is_available = False
+        self.cache = TTLCache(maxsize=settings.AI_CACHE_MAXSIZE, ttl=settings.AI_CACHE_TTL)
+        self.disk_cache = None
+        self._consecutive_failures = 0
+        self._breaker_open_until = 0.0
         self.initialize_client()
+        self.initialize_cache()
     
     def initialize_client(self):
         """Initialize OpenAI client if API key is available"""
         try:
             if settings.OPENAI_API_KEY:
-                self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+                # Shared keep-alive pool so TLS handshakes are amortized across requests
+                self._http = httpx.AsyncClient(
+                    http2=True,
+                    limits=httpx.Limits(
+                        max_keepalive_connections=32,
+                        max_connections=64,
+                        keepalive_expiry=60
+                    ),
+                    timeout=httpx.Timeout(settings.AI_REQUEST_TIMEOUT, connect=5.0)
+                )
+                # The SDK retries connection errors, 429s and 5xx with exponential backoff
+                self.client = AsyncOpenAI(
+                    api_key=settings.OPENAI_API_KEY,
+                    http_client=self._http,
+                    max_retries=settings.AI_MAX_RETRIES,
+                    timeout=settings.AI_REQUEST_TIMEOUT
+                )
                 self.is_available = True
                 logger.info("OpenAI client initialized successfully")
             else:
@@ -27,7 +226,83 @@ class AIAssistant:
             logger.error(f"Failed to initialize OpenAI client: {e}")
             self.is_available = False
     
-    def analyze_assignment(self, assignment_description: str, context: str = "") -> Dict[str, Any]:
+    async def close(self):
+        """Close the pooled HTTP client"""
+        try:
+            if self._http:
+                await self._http.aclose()
+                self._http = None
+                logger.info("OpenAI HTTP client closed")
+        except Exception as e:
+            logger.error(f"Error closing OpenAI HTTP client: {e}")
+    
+    def _circuit_open(self) -> bool:
+        """Check whether repeated failures have tripped the circuit breaker"""
+        return time.monotonic() < self._breaker_open_until
+    
+    def _record_success(self) -> None:
+        """Reset the circuit breaker failure count"""
+        self._consecutive_failures = 0
+    
+    def _record_failure(self) -> None:
+        """Count a failed OpenAI call, opening the circuit after too many in a row"""
+        self._consecutive_failures += 1
+        if self._consecutive_failures >= settings.AI_BREAKER_FAIL_MAX:
+            self._breaker_open_until = time.monotonic() + settings.AI_BREAKER_RESET_TIMEOUT
+            self._consecutive_failures = 0
+            logger.warning(
+                f"OpenAI circuit breaker opened for {settings.AI_BREAKER_RESET_TIMEOUT}s after repeated failures"
+            )
+    
+    def initialize_cache(self):
+        """Initialize the persistent response cache if a cache directory is configured"""
+        if not settings.AI_CACHE_DIR:
+            return
+        try:
+            import diskcache
+            self.disk_cache = diskcache.Cache(settings.AI_CACHE_DIR)
+            logger.info(f"AI disk cache enabled at {settings.AI_CACHE_DIR}")
+        except Exception as e:
+            logger.error(f"Failed to initialize AI disk cache: {e}")
+            self.disk_cache = None
+    
+    def _cache_key(self, method: str, **kwargs) -> str:
+        """Build a content-addressed cache key for an AI request"""
+        payload = {
+            key: value.strip() if isinstance(value, str) else value
+            for key, value in kwargs.items()
+        }
+        payload.update(
+            method=method,
+            model=settings.OPENAI_MODEL,
+            temperature=settings.AI_TEMPERATURE
+        )
+        serialized = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+        return hashlib.sha256(serialized).hexdigest()
+    
+    def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a cached AI response, promoting disk hits to memory"""
+        result = self.cache.get(key)
+        if result is None and self.disk_cache is not None:
+            try:
+                result = self.disk_cache.get(key)
+            except Exception as e:
+                logger.warning(f"AI disk cache read failed: {e}")
+                result = None
+            if result is not None:
+                self.cache[key] = result
+        return result
+    
+    def _cache_set(self, key: str, result: Dict[str, Any]) -> None:
+        """Store an AI response in the cache tiers"""
+        self.cache[key] = result
+        if self.disk_cache is not None:
+            try:
+                self.disk_cache.set(key, result, expire=settings.AI_CACHE_TTL)
+            except Exception as e:
+                logger.warning(f"AI disk cache write failed: {e}")
+    
+    async def analyze_assignment(self, assignment_description: str, context: str = "") -> Dict[str, Any]:
         """
         Analyze an assignment and provide learning guidance
         
@@ -38,126 +313,353 @@ class AIAssistant:
         Returns:
             Dictionary containing analysis and guidance
         """
+        return await self._invoke(
+            'analyze_assignment',
+            {"assignment_description": assignment_description, "context": context},
+            lambda: self._analysis_messages(assignment_description, context),
+            max_tokens=_ANALYSIS_MAX_TOKENS,
+            temperature=settings.AI_TEMPERATURE,
+            text_key="analysis",
+            fallback=lambda: self._get_fallback_analysis(assignment_description),
+            description="assignment analysis"
+        )
+    
+    async def _invoke(
+        self,
+        method: str,
+        cache_params: Dict[str, Any],
+        build_messages: Callable[[], List[Dict[str, str]]],
+        max_tokens: int,
+        temperature: float,
+        text_key: str,
+        fallback: Callable[[], Dict[str, Any]],
+        description: str
+    ) -> Dict[str, Any]:
+        """
+        Run a single JSON-mode chat completion with caching and fallbacks
+        
+        Args:
+            method: Name of the calling method, used in the cache key
+            cache_params: Request parameters that identify the result in the cache
+            build_messages: Builds the chat messages when a request is needed
+            max_tokens: Upper bound on response tokens
+            temperature: Sampling temperature
+            text_key: Key holding the raw text if the response is not valid JSON
+            fallback: Builds the response used when AI is unavailable or fails
+            description: What is being generated, for logging
+            
+        Returns:
+            Parsed JSON response, or the fallback response
+        """
         if not self.is_available:
-            return self._get_fallback_analysis(assignment_description)
+            return fallback()
+        
+        cache_key = self._cache_key(method, **cache_params)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            logger.info(f"Returning cached {description}")
+            return cached
+        
+        if self._circuit_open():
+            return fallback()
         
         try:
-            prompt = f"""
-            You are an educational assistant that helps students understand assignments 
-            without doing the work for them. Analyze this assignment and provide helpful guidance.
+            await ensure_token_encoding()
+            messages = build_messages()
             
-            ASSIGNMENT: {assignment_description}
-            CONTEXT: {context}
+            response = await self.client.chat.completions.create(
+                model=settings.OPENAI_MODEL,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=self._max_tokens(messages, max_tokens),
+                response_format={"type": "json_object"}
+            )
             
-            Please provide a structured analysis with the following sections:
+            self._record_success()
+            response_text = response.choices[0].message.content
             
-            1. KEY_CONCEPTS: List the main concepts and topics this assignment covers
-            2. LEARNING_OBJECTIVES: What the student should learn from this assignment
-            3. STEP_BY_STEP_APPROACH: A suggested approach to complete the assignment
-            4. COMMON_MISTAKES: Common errors students make with this type of assignment
-            5. RESOURCES: Recommended learning resources (books, websites, videos)
-            6. TIME_ESTIMATE: Estimated time needed to complete
-            7. DIFFICULTY_LEVEL: Easy/Medium/Hard with explanation
+            # JSON mode can still yield invalid JSON if the response is truncated
+            try:
+                result = orjson.loads(response_text)
+                logger.info(f"Successfully generated {description}")
+            except orjson.JSONDecodeError:
+                logger.warning(f"AI response for {description} was not valid JSON, returning as text")
+                result = {text_key: response_text.strip()}
+            
+            self._cache_set(cache_key, result)
+            return result
+        
+        except PromptTooLongError:
+            raise
+        except Exception as e:
+            self._record_failure()
+            logger.error(f"Error generating {description}: {e}")
+            return fallback()
+    
+    def _prepare_prompt_text(self, text: str) -> str:
+        """Apply prompt compression to user-supplied text when enabled"""
+        if settings.COMPRESS_PROMPTS:
+            return _compress_prompt_text(text, settings.PROMPT_TOKEN_BUDGET)
+        return text
+    
+    def _analysis_messages(self, assignment_description: str, context: str) -> List[Dict[str, str]]:
+        """Build the chat messages for a single assignment analysis"""
+        prompt = _ANALYZE_TEMPLATE.format(
+            assignment_description=self._prepare_prompt_text(assignment_description),
+            context=self._prepare_prompt_text(context)
+        )
+        return [_TUTOR_SYSTEM, {"role": "user", "content": prompt}]
+    
+    def _max_tokens(self, messages: List[Dict[str, str]], cap: int, items: int = 1) -> int:
+        """
+        Size the response budget to the room left in the model's context window
+        
+        Args:
+            messages: The chat messages being sent
+            cap: Upper bound on response tokens requested by the caller
+            items: Number of items the response covers, each allowed AI_MAX_RESPONSE_TOKENS
             
-            Return your response as valid JSON with these exact keys.
-            """
+        Raises:
+            PromptTooLongError: If the prompt leaves too little room for a response
+        """
+        prompt_tokens = sum(_count_tokens(message["content"]) + _MESSAGE_TOKEN_OVERHEAD for message in messages)
+        available = settings.AI_CONTEXT_WINDOW - prompt_tokens - _RESPONSE_TOKEN_MARGIN
+        if available < _MIN_RESPONSE_TOKENS:
+            raise PromptTooLongError(
+                f"Prompt is too long ({prompt_tokens} tokens) for the {settings.AI_CONTEXT_WINDOW}-token context window"
+            )
+        return min(
+            cap,
+            settings.AI_MAX_RESPONSE_TOKENS * items,
+            settings.AI_MAX_COMPLETION_TOKENS,
+            available
+        )
+    
+    async def stream_analyze_assignment(self, assignment_description: str, context: str = "") -> AsyncIterator[str]:
+        """
+        Stream an assignment analysis as server-sent events
+        
+        Args:
+            assignment_description: The assignment text or description
+            context: Additional context about the course or subject
             
-            response = self.client.chat.completions.create(
+        Yields:
+            "delta" events carrying text as the model produces it, followed by
+            a final "analysis" event carrying the parsed analysis
+        """
+        if not self.is_available:
+            yield self._sse_event("analysis", self._get_fallback_analysis(assignment_description))
+            return
+        
+        cache_key = self._cache_key(
+            'analyze_assignment',
+            assignment_description=assignment_description,
+            context=context
+        )
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            logger.info("Returning cached assignment analysis")
+            yield self._sse_event("analysis", cached)
+            return
+        
+        if self._circuit_open():
+            yield self._sse_event("analysis", self._get_fallback_analysis(assignment_description))
+            return
+        
+        await ensure_token_encoding()
+        messages = self._analysis_messages(assignment_description, context)
+        try:
+            max_tokens = self._max_tokens(messages, _ANALYSIS_MAX_TOKENS)
+        except PromptTooLongError as e:
+            # Headers are already sent, so report the problem as an event
+            yield self._sse_event("error", {"detail": str(e)})
+            return
+        
+        try:
+            stream = await self.client.chat.completions.create(
                 model=settings.OPENAI_MODEL,
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": "You are an experienced educator and tutor. Provide helpful, structured guidance without completing the assignment for the student."
-                    },
-                    {
-                        "role": "user", 
-                        "content": prompt
-                    }
-                ],
+                messages=messages,
                 temperature=settings.AI_TEMPERATURE,
-                max_tokens=1500
+                max_tokens=max_tokens,
+                response_format={"type": "json_object"},
+                stream=True
             )
             
-            analysis_text = response.choices[0].message.content.strip()
+            parts = []
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield self._sse_event("delta", delta)
             
-            # Try to parse as JSON, fallback to text if invalid
+            self._record_success()
+            analysis_text = "".join(parts)
             try:
-                analysis = json.loads(analysis_text)
-                logger.info("Successfully analyzed assignment with AI")
-                return analysis
-            except json.JSONDecodeError:
-                logger.warning("AI response was not valid JSON, returning as text")
-                return {"analysis": analysis_text}
-                
+                analysis = orjson.loads(analysis_text)
+                logger.info("Successfully streamed assignment analysis")
+            except orjson.JSONDecodeError:
+                logger.warning("Streamed AI response was not valid JSON, returning as text")
+                analysis = {"analysis": analysis_text.strip()}
+            
+            self._cache_set(cache_key, analysis)
+            
         except Exception as e:
-            logger.error(f"Error in AI assignment analysis: {e}")
-            return self._get_fallback_analysis(assignment_description)
+            self._record_failure()
+            logger.error(f"Error in streamed AI assignment analysis: {e}")
+            analysis = self._get_fallback_analysis(assignment_description)
+        
+        yield self._sse_event("analysis", analysis)
+    
+    @staticmethod
+    def _sse_event(event: str, data: Any) -> str:
+        """Format a server-sent event"""
+        return f"event: {event}\ndata: {orjson.dumps(data).decode('utf-8')}\n\n"
     
-    def help_with_question(self, question: str, question_type: str = "multiple_choice") -> Dict[str, Any]:
+    async def analyze_assignments_batch(self, items: List[AnalysisRequest]) -> List[Dict[str, Any]]:
         """
-        Provide help with understanding a question without giving the answer
+        Analyze several assignments, packing uncached items into shared AI requests
         
         Args:
-            question: The question text
-            question_type: Type of question (multiple_choice, essay, math, etc.)
+            items: The assignments to analyze
             
         Returns:
-            Dictionary containing explanation and guidance
+            List of analyses in the same order as the input items
         """
         if not self.is_available:
-            return self._get_fallback_question_help(question, question_type)
+            return [self._get_fallback_analysis(item.assignment_description) for item in items]
+        
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        pending = []
+        
+        for index, item in enumerate(items):
+            cache_key = self._cache_key(
+                'analyze_assignment',
+                assignment_description=item.assignment_description,
+                context=item.context
+            )
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                results[index] = cached
+            else:
+                pending.append((index, item, cache_key))
+        
+        if pending and self._circuit_open():
+            for index, item, _ in pending:
+                results[index] = self._get_fallback_analysis(item.assignment_description)
+            return results
+        
+        await ensure_token_encoding()
+        chunks = self._plan_batch_chunks(pending)
+        chunk_analyses = await asyncio.gather(
+            *(self._analyze_assignment_chunk([item for _, item, _ in chunk]) for chunk in chunks)
+        )
+        
+        for chunk, analyses in zip(chunks, chunk_analyses):
+            for (index, item, cache_key), analysis in zip(chunk, analyses):
+                if analysis is None:
+                    results[index] = self._get_fallback_analysis(item.assignment_description)
+                else:
+                    self._cache_set(cache_key, analysis)
+                    results[index] = analysis
         
+        logger.info(f"Analyzed {len(items)} assignments ({len(items) - len(pending)} from cache)")
+        return results
+    
+    def _plan_batch_chunks(self, pending: List[tuple]) -> List[List[tuple]]:
+        """Group pending (index, item, cache_key) entries so each request's prompt and response fit"""
+        per_item_response = min(_ANALYSIS_MAX_TOKENS, settings.AI_MAX_RESPONSE_TOKENS)
+        max_items = max(1, min(settings.AI_BATCH_SIZE, settings.AI_MAX_COMPLETION_TOKENS // per_item_response))
+        base_tokens = (
+            _count_tokens(_TUTOR_SYSTEM["content"]) + _count_tokens(_ANALYZE_BATCH_TEMPLATE)
+            + 2 * _MESSAGE_TOKEN_OVERHEAD + _RESPONSE_TOKEN_MARGIN
+        )
+        item_overhead = _count_tokens(_BATCH_ITEM_TEMPLATE)
+        
+        chunks: List[List[tuple]] = []
+        current: List[tuple] = []
+        current_tokens = base_tokens
+        for entry in pending:
+            item = entry[1]
+            # Raw text is an upper bound, as prompt compression only shrinks it
+            item_tokens = (
+                item_overhead + _count_tokens(item.assignment_description)
+                + _count_tokens(item.context or '') + per_item_response
+            )
+            if current and (len(current) == max_items or current_tokens + item_tokens > settings.AI_CONTEXT_WINDOW):
+                chunks.append(current)
+                current = []
+                current_tokens = base_tokens
+            current.append(entry)
+            current_tokens += item_tokens
+        if current:
+            chunks.append(current)
+        return chunks
+    
+    async def _analyze_assignment_chunk(self, items: List[AnalysisRequest]) -> List[Optional[Dict[str, Any]]]:
+        """Analyze a group of assignments with a single OpenAI request"""
         try:
-            prompt = f"""
-            You are a tutor helping a student understand a {question_type} question 
-            without giving away the answer.
-            
-            QUESTION: {question}
-            QUESTION_TYPE: {question_type}
-            
-            Please provide helpful guidance with the following structure:
-            
-            1. QUESTION_BREAKDOWN: Explain what the question is asking in simpler terms
-            2. KEY_CONCEPTS: List the concepts needed to answer this question
-            3. THINKING_PROCESS: Step-by-step approach to solve this type of question
-            4. RELATED_EXAMPLES: Similar examples or practice problems
-            5. CHECKING_WORK: How to verify the answer is correct
-            6. LEARNING_TIPS: Strategies for mastering this type of question
-            
-            Return your response as valid JSON with these exact keys.
-            Do not provide the direct answer to the question.
-            """
+            assignments_text = "\n\n".join(
+                _BATCH_ITEM_TEMPLATE.format(
+                    number=number,
+                    assignment_description=self._prepare_prompt_text(item.assignment_description),
+                    context=self._prepare_prompt_text(item.context or '')
+                )
+                for number, item in enumerate(items, 1)
+            )
+            prompt = _ANALYZE_BATCH_TEMPLATE.format(count=len(items), assignments=assignments_text)
+            messages = [_TUTOR_SYSTEM, {"role": "user", "content": prompt}]
             
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model=settings.OPENAI_MODEL,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a patient tutor who explains concepts clearly without giving away answers. Encourage learning and understanding."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
+                messages=messages,
                 temperature=settings.AI_TEMPERATURE,
-                max_tokens=1200
+                max_tokens=self._max_tokens(messages, _ANALYSIS_MAX_TOKENS * len(items), items=len(items)),
+                response_format={"type": "json_object"}
             )
             
-            help_text = response.choices[0].message.content.strip()
+            self._record_success()
+            data = orjson.loads(response.choices[0].message.content)
+            analyses = data.get("results") if isinstance(data, dict) else None
             
-            try:
-                help_data = json.loads(help_text)
-                logger.info(f"Successfully provided help for {question_type} question")
-                return help_data
-            except json.JSONDecodeError:
-                return {"explanation": help_text}
-                
+            if not isinstance(analyses, list) or len(analyses) != len(items):
+                logger.warning("Batched AI response did not match the number of assignments")
+                return [None] * len(items)
+            
+            return [analysis if isinstance(analysis, dict) else None for analysis in analyses]
+        
+        except PromptTooLongError as e:
+            # Items too long for the context window get the fallback like any failed item
+            logger.warning(f"Skipping AI batch analysis: {e}")
+            return [None] * len(items)
         except Exception as e:
-            logger.error(f"Error in AI question help: {e}")
-            return self._get_fallback_question_help(question, question_type)
+            self._record_failure()
+            logger.error(f"Error in AI batch assignment analysis: {e}")
+            return [None] * len(items)
+    
+    async def help_with_question(self, question: str, question_type: str = "multiple_choice") -> Dict[str, Any]:
+        """
+        Provide help with understanding a question without giving the answer
+        
+        Args:
+            question: The question text
+            question_type: Type of question (multiple_choice, essay, math, etc.)
+            
+        Returns:
+            Dictionary containing explanation and guidance
+        """
+        prompt = _QUESTION_TEMPLATE.format(question=question, question_type=question_type)
+        return await self._invoke(
+            'help_with_question',
+            {"question": question, "question_type": question_type},
+            lambda: [_QUESTION_SYSTEM, {"role": "user", "content": prompt}],
+            max_tokens=1200,
+            temperature=settings.AI_TEMPERATURE,
+            text_key="explanation",
+            fallback=lambda: self._get_fallback_question_help(question, question_type),
+            description=f"help for {question_type} question"
+        )
     
-    def generate_study_notes(self, topic: str, key_points: List[str] = None) -> Dict[str, Any]:
+    async def generate_study_notes(self, topic: str, key_points: List[str] = None) -> Dict[str, Any]:
         """
         Generate study notes for a specific topic
         
@@ -171,56 +673,18 @@ class AIAssistant:
         if not self.is_available:
             return {"topic": topic, "notes": f"Study notes for {topic} would be generated here with AI."}
         
-        try:
-            key_points_text = "\n".join(key_points) if key_points else "Cover the most important aspects."
-            
-            prompt = f"""
-            Create comprehensive study notes for the following topic:
-            
-            TOPIC: {topic}
-            KEY_POINTS_TO_COVER: {key_points_text}
-            
-            Please organize the notes as follows:
-            
-            1. OVERVIEW: Brief introduction to the topic
-            2. KEY_DEFINITIONS: Important terms and definitions
-            3. MAIN_CONCEPTS: Core concepts explained clearly
-            4. EXAMPLES: Relevant examples and applications
-            5. FORMULAS_EQUATIONS: Any important formulas (if applicable)
-            6. STUDY_TIPS: Effective ways to study this topic
-            7. PRACTICE_SUGGESTIONS: Ideas for practice and application
-            
-            Return as valid JSON with these exact keys.
-            """
-            
-            response = self.client.chat.completions.create(
-                model=settings.OPENAI_MODEL,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert educator who creates clear, organized, and effective study materials."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.5,  # Lower temperature for more consistent study materials
-                max_tokens=2000
-            )
-            
-            notes_text = response.choices[0].message.content.strip()
-            
-            try:
-                notes = json.loads(notes_text)
-                logger.info(f"Successfully generated study notes for: {topic}")
-                return notes
-            except json.JSONDecodeError:
-                return {"study_notes": notes_text}
-                
-        except Exception as e:
-            logger.error(f"Error generating study notes: {e}")
-            return {"topic": topic, "error": "Failed to generate study notes"}
+        key_points_text = "\n".join(key_points) if key_points else "Cover the most important aspects."
+        prompt = _NOTES_TEMPLATE.format(topic=topic, key_points=key_points_text)
+        return await self._invoke(
+            'generate_study_notes',
+            {"topic": topic, "key_points": key_points or []},
+            lambda: [_NOTES_SYSTEM, {"role": "user", "content": prompt}],
+            max_tokens=2000,
+            temperature=0.5,  # Lower temperature for more consistent study materials
+            text_key="study_notes",
+            fallback=lambda: {"topic": topic, "error": "Failed to generate study notes"},
+            description=f"study notes for: {topic}"
+        )
     
     def _get_fallback_analysis(self, assignment_description: str) -> Dict[str, Any]:
         """Provide fallback analysis when AI is unavailable"""
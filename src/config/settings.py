@@ -1,49 +1,93 @@
 import os
-from dotenv import load_dotenv
-from typing import List
+from functools import cached_property
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Tuple
 
-load_dotenv()
-
-class Settings:
+class Settings(BaseSettings):
+    # Values are read from the environment (or .env) and validated once at startup
+    # Production deploys inject the environment directly, so skip reading .env there
+    model_config = SettingsConfigDict(
+        env_file=None if os.getenv('PROD') else '.env',
+        extra='ignore',
+        frozen=True
+    )
+    
     # Google API Configuration
-    GOOGLE_CLIENT_SECRET_FILE: str = os.getenv('GOOGLE_CLIENT_SECRET_FILE', 'credentials.json')
-    GOOGLE_TOKEN_FILE: str = os.getenv('GOOGLE_TOKEN_FILE', 'token.pickle')
+    GOOGLE_CLIENT_SECRET_FILE: str = 'credentials.json'
+    GOOGLE_TOKEN_FILE: str = 'token.json'
     
     # Google API Scopes
-    SCOPES: List[str] = [
+    SCOPES: Tuple[str, ...] = (
         'https://www.googleapis.com/auth/classroom.courses.readonly',
         'https://www.googleapis.com/auth/classroom.coursework.me',
         'https://www.googleapis.com/auth/classroom.coursework.students',
         'https://www.googleapis.com/auth/documents',
         'https://www.googleapis.com/auth/presentations',
         'https://www.googleapis.com/auth/drive.file'
-    ]
+    )
     
     # AI Configuration
-    OPENAI_API_KEY: str = os.getenv('OPENAI_API_KEY', '')
-    OPENAI_MODEL: str = os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
-    AI_TEMPERATURE: float = float(os.getenv('AI_TEMPERATURE', '0.7'))
+    OPENAI_API_KEY: str = ''
+    OPENAI_MODEL: str = 'gpt-3.5-turbo'
+    AI_TEMPERATURE: float = 0.7
+    
+    # AI Response Cache
+    AI_CACHE_MAXSIZE: int = 1024
+    AI_CACHE_TTL: int = 3600
+    AI_CACHE_DIR: str = ''  # Empty disables the persistent tier
+    
+    # AI Request Resilience
+    AI_REQUEST_TIMEOUT: float = 20.0
+    AI_MAX_RETRIES: int = 3
+    AI_BREAKER_FAIL_MAX: int = 5
+    AI_BREAKER_RESET_TIMEOUT: int = 30
+    
+    # Number of assignments packed into a single batched AI request
+    AI_BATCH_SIZE: int = 4
+    
+    # Prompt compression for long assignment text (lossy, off by default)
+    COMPRESS_PROMPTS: bool = False
+    PROMPT_TOKEN_BUDGET: int = 1500
+    
+    # AI token budgeting
+    AI_CONTEXT_WINDOW: int = 16385  # gpt-3.5-turbo
+    # Response budget per analysed item; a batched request gets this for each item it packs
+    AI_MAX_RESPONSE_TOKENS: int = 2000
+    # The model's limit on tokens generated in a single response
+    AI_MAX_COMPLETION_TOKENS: int = 4096
     
     # Platform Credentials
-    CLEVER_USERNAME: str = os.getenv('CLEVER_USERNAME', '')
-    CLEVER_PASSWORD: str = os.getenv('CLEVER_PASSWORD', '')
-    MCGRAW_HILL_USERNAME: str = os.getenv('MCGRAW_HILL_USERNAME', '')
-    MCGRAW_HILL_PASSWORD: str = os.getenv('MCGRAW_HILL_PASSWORD', '')
-    EDPUZZLE_USERNAME: str = os.getenv('EDPUZZLE_USERNAME', '')
-    EDPUZZLE_PASSWORD: str = os.getenv('EDPUZZLE_PASSWORD', '')
+    CLEVER_USERNAME: str = ''
+    CLEVER_PASSWORD: str = ''
+    # Saved Clever session (cookies and local storage) reused across restarts
+    CLEVER_STORAGE_STATE_FILE: str = 'clever_state.json'
+    # Browser contexts a single service may drive at once
+    MAX_CONCURRENT_CONTEXTS: int = 4
+    MCGRAW_HILL_USERNAME: str = ''
+    MCGRAW_HILL_PASSWORD: str = ''
+    EDPUZZLE_USERNAME: str = ''
+    EDPUZZLE_PASSWORD: str = ''
     
     # Application Settings
-    DEBUG: bool = os.getenv('DEBUG', 'False').lower() == 'true'
-    PORT: int = int(os.getenv('PORT', '8000'))
-    HOST: str = os.getenv('HOST', '0.0.0.0')
+    DEBUG: bool = False
+    PORT: int = 8000
+    HOST: str = '0.0.0.0'
+    WEB_CONCURRENCY: int = 4
     
     # Security
-    SECRET_KEY: str = os.getenv('SECRET_KEY', 'your-secret-key-here')
+    SECRET_KEY: str = 'your-secret-key-here'
     
     # Rate Limiting
-    REQUESTS_PER_MINUTE: int = int(os.getenv('REQUESTS_PER_MINUTE', '60'))
+    REQUESTS_PER_MINUTE: int = 60
+    GOOGLE_API_CONCURRENCY: int = 8
+    # Retries for Google API calls that fail with 429 or 5xx
+    GOOGLE_API_MAX_RETRIES: int = 4
+    GOOGLE_API_MAX_BACKOFF: float = 32.0
     
-    @property
+    # Service status refresh interval in seconds
+    SERVICE_STATUS_REFRESH_SECONDS: int = 30
+    
+    @cached_property
     def is_ai_available(self) -> bool:
         """Check if AI features are available"""
         return bool(self.OPENAI_API_KEY)
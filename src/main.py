@@ -1,17 +1,30 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from src.services.google_classroom import GoogleClassroomService
 from src.services.google_docs import GoogleDocsService
 from src.services.clever import CleverService
 from src.services.mcgraw_hill import McGrawHillService
 from src.services.edpuzzle import EdpuzzleService
-from src.ai.assistant import AIAssistant
+from src.services._browser_pool import shutdown_pool
+from src.ai.assistant import AIAssistant, PromptTooLongError, ensure_token_encoding
+from src.config.settings import settings
 from src.models.schemas import Assignment, Course, AnalysisRequest, QuestionHelpRequest
+from src.utils.helpers import validate_credentials
 import asyncio
+from datetime import datetime, timezone
+import logging
 from typing import List, Dict, Any
 import uvicorn
 
-app = FastAPI(title="Edu AI Assistant", version="1.0.0", description="AI-powered educational assistant")
+logger = logging.getLogger(__name__)
+
+app = FastAPI(
+    title="Edu AI Assistant",
+    version="1.0.0",
+    description="AI-powered educational assistant",
+    default_response_class=ORJSONResponse
+)
 
 # CORS middleware
 app.add_middleware(
@@ -27,6 +40,75 @@ classroom_service = GoogleClassroomService()
 docs_service = GoogleDocsService()
 ai_assistant = AIAssistant()
 
+# Browser-backed services keep their logged-in session for the app lifetime
+clever_service = CleverService()
+mcgraw_service = McGrawHillService()
+edpuzzle_service = EdpuzzleService()
+browser_services = [clever_service, mcgraw_service, edpuzzle_service]
+
+# Service status snapshot, refreshed in the background so /services/status never probes inline
+SERVICE_STATUS: Dict[str, str] = {}
+_background_tasks: List[asyncio.Task] = []
+
+def _compute_service_status() -> Dict[str, str]:
+    """Derive service availability from configuration and client state"""
+    credentials = validate_credentials()
+    
+    def availability(is_available: bool) -> str:
+        return "available" if is_available else "unavailable"
+    
+    # McGraw Hill and Edpuzzle are reached through Clever SSO
+    return {
+        "google_classroom": availability(credentials['google_credentials']),
+        "google_docs": availability(credentials['google_credentials']),
+        "ai_assistant": availability(ai_assistant.is_available),
+        "clever": availability(credentials['clever_credentials']),
+        "mcgraw_hill": availability(credentials['clever_credentials']),
+        "edpuzzle": availability(credentials['clever_credentials'])
+    }
+
+async def _refresh_service_status():
+    """Periodically refresh the service status snapshot"""
+    while True:
+        await asyncio.sleep(settings.SERVICE_STATUS_REFRESH_SECONDS)
+        try:
+            SERVICE_STATUS.update(_compute_service_status())
+        except Exception as e:
+            logger.error(f"Error refreshing service status: {e}")
+
+async def _login_browser_service(service: CleverService) -> None:
+    """Log a browser-backed service in ahead of its first request"""
+    try:
+        async with service.lock:
+            if not service.is_logged_in and not await service.login():
+                logger.warning(f"{type(service).__name__} startup login failed")
+    except Exception as e:
+        logger.error(f"{type(service).__name__} startup login error: {e}")
+
+@app.on_event("startup")
+async def start_background_tasks():
+    """Compute the initial service status and start background work"""
+    SERVICE_STATUS.update(_compute_service_status())
+    _background_tasks.append(asyncio.create_task(_refresh_service_status()))
+    # Fetch the tokenizer in a worker thread so the first AI request does not wait on it
+    _background_tasks.append(asyncio.create_task(ensure_token_encoding()))
+    
+    # Warm the browser sessions without delaying startup
+    if SERVICE_STATUS["clever"] == "available":
+        for service in browser_services:
+            _background_tasks.append(asyncio.create_task(_login_browser_service(service)))
+
+@app.on_event("shutdown")
+async def shutdown_services():
+    """Stop background tasks and release connections held by long-lived services"""
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*(service.close() for service in browser_services))
+    await shutdown_pool()
+    await ai_assistant.close()
+    await classroom_service.close()
+    await docs_service.close()
+
 @app.get("/")
 async def root():
     return {
@@ -37,13 +119,13 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": __import__('datetime').datetime.now().isoformat()}
+    return {"status": "healthy", "timestamp": datetime.now(timezone.utc).isoformat()}
 
 @app.get("/courses", response_model=List[Course])
 async def get_courses():
     """Get all Google Classroom courses"""
     try:
-        courses = classroom_service.get_courses()
+        courses = await classroom_service.get_courses()
         return courses
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching courses: {str(e)}")
@@ -52,26 +134,56 @@ async def get_courses():
 async def get_assignments(course_id: str):
     """Get assignments for a specific course"""
     try:
-        assignments = classroom_service.get_assignments(course_id)
+        assignments = await classroom_service.get_assignments(course_id)
         return assignments
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching assignments: {str(e)}")
 
+@app.post("/courses/assignments/bulk", response_model=Dict[str, List[Assignment]])
+async def get_assignments_bulk(course_ids: List[str]):
+    """Get assignments for several courses in batched Classroom API requests"""
+    try:
+        unique_ids = list(dict.fromkeys(course_ids))
+        return await classroom_service.get_assignments_for_courses(unique_ids)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching assignments: {str(e)}")
+
 @app.post("/ai/analyze-assignment")
 async def analyze_assignment(request: AnalysisRequest):
     """Get AI analysis and guidance for an assignment"""
     try:
-        analysis = ai_assistant.analyze_assignment(request.assignment_description, request.context)
+        analysis = await ai_assistant.analyze_assignment(request.assignment_description, request.context)
         return {"analysis": analysis}
+    except PromptTooLongError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing assignment: {str(e)}")
 
+@app.post("/ai/analyze-assignment/stream")
+async def stream_analyze_assignment(request: AnalysisRequest):
+    """Stream AI analysis for an assignment as server-sent events"""
+    return StreamingResponse(
+        ai_assistant.stream_analyze_assignment(request.assignment_description, request.context),
+        media_type="text/event-stream"
+    )
+
+@app.post("/ai/analyze-assignments-batch")
+async def analyze_assignments_batch(items: List[AnalysisRequest]):
+    """Get AI analysis and guidance for several assignments at once"""
+    try:
+        analyses = await ai_assistant.analyze_assignments_batch(items)
+        return {"analyses": analyses}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing assignments: {str(e)}")
+
 @app.post("/ai/help-with-question")
 async def help_with_question(request: QuestionHelpRequest):
     """Get AI help for understanding a question"""
     try:
-        help_response = ai_assistant.help_with_question(request.question, request.question_type)
+        help_response = await ai_assistant.help_with_question(request.question, request.question_type)
         return {"help": help_response}
+    except PromptTooLongError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing question: {str(e)}")
 
@@ -79,7 +191,7 @@ async def help_with_question(request: QuestionHelpRequest):
 async def create_document(title: str, content: str = ""):
     """Create a new Google Document"""
     try:
-        document = docs_service.create_document(title, content)
+        document = await docs_service.create_document(title, content)
         if document:
             return {"document": document, "message": "Document created successfully"}
         else:
@@ -90,63 +202,59 @@ async def create_document(title: str, content: str = ""):
 @app.get("/clever/apps")
 async def get_clever_apps():
     """Get available applications from Clever"""
-    clever_service = CleverService()
     try:
-        if await clever_service.login():
+        async with clever_service.lock:
+            if not clever_service.is_logged_in and not await clever_service.login():
+                raise HTTPException(status_code=401, detail="Clever login failed")
             apps = await clever_service.get_applications()
-            await clever_service.close()
-            return {"applications": apps}
-        else:
-            raise HTTPException(status_code=401, detail="Clever login failed")
+        return {"applications": apps}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/mcgraw-hill/assignments")
 async def get_mcgraw_assignments():
     """Get assignments from McGraw Hill"""
-    mcgraw_service = McGrawHillService()
     try:
-        if await mcgraw_service.login():
+        async with mcgraw_service.lock:
+            if not mcgraw_service.is_logged_in and not await mcgraw_service.login():
+                raise HTTPException(status_code=401, detail="McGraw Hill login failed")
             assignments = await mcgraw_service.get_assignments()
-            await mcgraw_service.close()
-            return {"assignments": assignments}
-        else:
-            raise HTTPException(status_code=401, detail="McGraw Hill login failed")
+        return {"assignments": assignments}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/edpuzzle/assignments")
 async def get_edpuzzle_assignments():
     """Get video assignments from Edpuzzle"""
-    edpuzzle_service = EdpuzzleService()
     try:
-        if await edpuzzle_service.login():
+        async with edpuzzle_service.lock:
+            if not edpuzzle_service.is_logged_in and not await edpuzzle_service.login():
+                raise HTTPException(status_code=401, detail="Edpuzzle login failed")
             assignments = await edpuzzle_service.get_video_assignments()
-            await edpuzzle_service.close()
-            return {"assignments": assignments}
-        else:
-            raise HTTPException(status_code=401, detail="Edpuzzle login failed")
+        return {"assignments": assignments}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/services/status")
 async def get_services_status():
     """Check status of all services"""
-    status = {
-        "google_classroom": "available",
-        "google_docs": "available",
-        "ai_assistant": "available" if ai_assistant.client else "unavailable",
-        "clever": "available",
-        "mcgraw_hill": "available",
-        "edpuzzle": "available"
-    }
-    return {"services": status}
+    return {"services": SERVICE_STATUS}
 
 if __name__ == "__main__":
+    # Reload is for development only; production runs multiple workers on uvloop/httptools
     uvicorn.run(
         "src.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
+        host=settings.HOST,
+        port=settings.PORT,
+        loop="uvloop",
+        http="httptools",
+        reload=settings.DEBUG,
+        workers=None if settings.DEBUG else settings.WEB_CONCURRENCY,
         log_level="info"
-      )
+    )
@@ -0,0 +1,64 @@
+from playwright.async_api import async_playwright, Browser, BrowserContext, Playwright, Route
+import asyncio
+from typing import Optional
+from urllib.parse import urlsplit
+import logging
+
+logger = logging.getLogger(__name__)
+
+# One Playwright driver and Chromium process shared by every browser-based service
+_playwright: Optional[Playwright] = None
+_browser: Optional[Browser] = None
+_lock = asyncio.Lock()
+
+# Scraping only reads text and links, so these are never needed
+_BLOCKED_RESOURCE_TYPES = frozenset({'image', 'media', 'font'})
+_BLOCKED_HOSTS = ('google-analytics.com', 'googletagmanager.com', 'segment.io', 'sentry.io')
+
+async def get_browser() -> Browser:
+    """Get the shared browser, launching it on first use"""
+    global _playwright, _browser
+
+    async with _lock:
+        if _browser is None or not _browser.is_connected():
+            if _playwright is None:
+                _playwright = await async_playwright().start()
+            _browser = await _playwright.chromium.launch(
+                headless=True,
+                args=['--no-sandbox', '--disable-dev-shm-usage']
+            )
+            logger.info("Launched shared Chromium browser")
+        return _browser
+
+async def _block_nonessential(route: Route):
+    """Abort requests for media, fonts and analytics; let everything else through"""
+    request = route.request
+    host = urlsplit(request.url).hostname or ''
+    if request.resource_type in _BLOCKED_RESOURCE_TYPES or host.endswith(_BLOCKED_HOSTS):
+        await route.abort()
+    else:
+        await route.continue_()
+
+async def new_context(**kwargs) -> BrowserContext:
+    """Open an isolated browser context (cookies, storage) on the shared browser"""
+    browser = await get_browser()
+    context = await browser.new_context(**kwargs)
+    await context.route('**/*', _block_nonessential)
+    return context
+
+async def shutdown_pool():
+    """Close the shared browser and stop the Playwright driver"""
+    global _playwright, _browser
+
+    async with _lock:
+        try:
+            if _browser is not None:
+                await _browser.close()
+            if _playwright is not None:
+                await _playwright.stop()
+            logger.info("Shared Chromium browser closed")
+        except Exception as e:
+            logger.error(f"Error shutting down browser pool: {e}")
+        finally:
+            _browser = None
+            _playwright = None
@@ -1,36 +1,98 @@
-from playwright.async_api import async_playwright
+from playwright.async_api import Page, TimeoutError as PlaywrightTimeoutError
 import asyncio
+import os
+import re
+import orjson
+from src.services._browser_pool import new_context
 from src.config.settings import settings
-from typing import List, Dict, Optional
+from src.utils.helpers import write_file_atomic
+from typing import List, Dict, Optional, Callable, Awaitable, TypeVar
 import logging
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar('T')
+
+# Extracts application cards from the Clever applications page in one DOM scan
+_APPLICATIONS_JS = '''() => {
+    const apps = [];
+    
+    // Collect app cards (strategy 1) and grid items (strategy 2) in a single DOM scan
+    const cardSelector = '[data-testid="app-card"], .app-card, [class*="app"], .application';
+    const gridSelector = '.grid-item, .tile, .app-tile';
+    const appCards = [];
+    const gridItems = [];
+    for (const element of document.querySelectorAll(cardSelector + ', ' + gridSelector)) {
+        if (element.matches(cardSelector)) appCards.push(element);
+        if (element.matches(gridSelector)) gridItems.push(element);
+    }
+    
+    // Strategy 1: Look for app cards
+    for (const card of appCards) {
+        // Read the card's text once: the first line is the name, the rest the description
+        const lines = (card.innerText || '').split('\\n').map(line => line.trim()).filter(Boolean);
+        const linkElement = card.querySelector('a');
+        
+        if (lines.length > 0) {
+            apps.push({
+                name: lines[0],
+                description: lines.slice(1).join(' '),
+                link: linkElement?.href || '',
+                icon: linkElement?.querySelector('img')?.src || ''
+            });
+        }
+    }
+    
+    // Strategy 2: Look for grid items
+    if (apps.length === 0) {
+        for (const item of gridItems) {
+            const link = item.querySelector('a');
+            if (link) {
+                const name = link.innerText?.trim() || link.getAttribute('title') || '';
+                if (name) {
+                    apps.push({
+                        name: name,
+                        description: '',
+                        link: link.href,
+                        icon: link.querySelector('img')?.src || ''
+                    });
+                }
+            }
+        }
+    }
+    
+    return apps;
+}'''
+
 class CleverService:
     def __init__(self):
         self.username = settings.CLEVER_USERNAME
         self.password = settings.CLEVER_PASSWORD
-        self.browser = None
+        self.context = None
         self.page = None
         self.is_logged_in = False
+        # Serializes use of the shared page when the service is long-lived
+        self.lock = asyncio.Lock()
     
     async def login(self) -> bool:
         """Login to Clever portal"""
         try:
-            playwright = await async_playwright().start()
-            self.browser = await playwright.chromium.launch(
-                headless=True,
-                args=['--no-sandbox', '--disable-dev-shm-usage']
-            )
+            # Each service gets its own context on the shared browser
+            if self.context:
+                await self.context.close()
+                self.context = None
             
-            self.page = await self.browser.new_page()
+            if await self._restore_session():
+                return True
+            
+            self.context = await new_context()
+            self.page = await self.context.new_page()
             
             # Set longer timeout for educational sites
             self.page.set_default_timeout(60000)
             
             # Navigate to Clever login
-            await self.page.goto('https://clever.com/in/edu-login')
-            await self.page.wait_for_timeout(3000)
+            await self.page.goto('https://clever.com/in/edu-login', wait_until='domcontentloaded')
             
             # Look for login form elements
             username_selectors = [
@@ -58,40 +120,40 @@ class CleverService:
                 '.login-button'
             ]
             
-            # Try to find and fill login form
-            username_filled = False
-            password_filled = False
-            
-            for selector in username_selectors:
-                if await self.page.query_selector(selector):
-                    await self.page.fill(selector, self.username)
-                    username_filled = True
-                    break
+            # Wait for whichever username field renders first
+            await self._wait_for_selector(', '.join(username_selectors))
             
-            for selector in password_selectors:
-                if await self.page.query_selector(selector):
-                    await self.page.fill(selector, self.password)
-                    password_filled = True
-                    break
+            # The form has rendered, so each probe is immediate; the first listed match wins
+            username_input = await self._query_first(username_selectors)
+            password_input = await self._query_first(password_selectors)
             
-            if not username_filled or not password_filled:
+            if not username_input or not password_input:
                 logger.error("Could not find login form elements")
                 return False
             
+            await username_input.fill(self.username)
+            await password_input.fill(self.password)
+            
             # Submit login form
-            for selector in submit_selectors:
-                if await self.page.query_selector(selector):
-                    await self.page.click(selector)
-                    break
+            submit_button = await self._query_first(submit_selectors)
+            if submit_button:
+                await submit_button.click()
             
-            # Wait for login to complete
-            await self.page.wait_for_timeout(8000)
+            # Wait for the redirect away from the login page
+            try:
+                await self.page.wait_for_url(
+                    lambda url: 'portal' in url or 'dashboard' in url,
+                    timeout=15000
+                )
+            except PlaywrightTimeoutError:
+                logger.warning("Timed out waiting for Clever login redirect")
             
             # Check if login was successful
             current_url = self.page.url
             if 'portal' in current_url or 'dashboard' in current_url or 'clever.com' in current_url:
                 self.is_logged_in = True
                 logger.info("Successfully logged into Clever")
+                await self._save_session()
                 return True
             else:
                 # Check for error messages
@@ -99,17 +161,14 @@ class CleverService:
                     '.error',
                     '.alert-error',
                     '[class*="error"]',
-                    'text=*error*i',
-                    'text=*invalid*i',
-                    'text=*incorrect*i'
+                    ':text-matches("error|invalid|incorrect", "i")'
                 ]
                 
-                for selector in error_selectors:
-                    error_element = await self.page.query_selector(selector)
-                    if error_element:
-                        error_text = await error_element.text_content()
-                        logger.error(f"Login error: {error_text}")
-                        return False
+                error_element = await self.page.query_selector(', '.join(error_selectors))
+                if error_element:
+                    error_text = await error_element.text_content()
+                    logger.error(f"Login error: {error_text}")
+                    return False
                 
                 logger.warning("Login status uncertain, continuing anyway")
                 self.is_logged_in = True
@@ -119,6 +178,85 @@ class CleverService:
             logger.error(f"Clever login failed: {e}")
             return False
     
+    async def _restore_session(self) -> bool:
+        """Resume a saved Clever session so the login form can be skipped"""
+        path = settings.CLEVER_STORAGE_STATE_FILE
+        if not path or not os.path.exists(path):
+            return False
+        
+        try:
+            self.context = await new_context(storage_state=path)
+            self.page = await self.context.new_page()
+            self.page.set_default_timeout(60000)
+            
+            # An expired session redirects back to the login page
+            await self.page.goto('https://clever.com/applications', wait_until='domcontentloaded')
+            if 'login' not in self.page.url:
+                self.is_logged_in = True
+                logger.info("Resumed saved Clever session")
+                return True
+            
+            logger.info("Saved Clever session has expired, logging in again")
+            # Drop the stale state so later starts do not repeat the failed restore
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not remove expired Clever session: {e}")
+        except Exception as e:
+            logger.warning(f"Could not resume saved Clever session: {e}")
+        
+        try:
+            if self.context:
+                await self.context.close()
+        except Exception as e:
+            logger.warning(f"Error closing browser context: {e}")
+        self.context = None
+        return False
+    
+    async def _save_session(self):
+        """Save the session's cookies and local storage for the next start"""
+        try:
+            if settings.CLEVER_STORAGE_STATE_FILE:
+                # Clever, McGraw Hill and Edpuzzle log in concurrently, so replace the file atomically
+                state = await self.context.storage_state()
+                await asyncio.to_thread(
+                    write_file_atomic, settings.CLEVER_STORAGE_STATE_FILE, orjson.dumps(state).decode('utf-8')
+                )
+        except Exception as e:
+            logger.warning(f"Could not save Clever session: {e}")
+    
+    async def run_parallel(self, jobs: List[Callable[[Page], Awaitable[T]]]) -> List[Optional[T]]:
+        """
+        Run browser jobs concurrently, each on its own page and context
+        
+        Args:
+            jobs: Coroutine functions that take a logged-in page
+            
+        Returns:
+            Each job's result in order, or None for jobs that failed
+        """
+        if not self.is_logged_in and not await self.login():
+            return [None] * len(jobs)
+        
+        # Every context starts from this session's cookies, so jobs skip the login
+        storage_state = await self.context.storage_state()
+        semaphore = asyncio.Semaphore(settings.MAX_CONCURRENT_CONTEXTS)
+        
+        async def run(job: Callable[[Page], Awaitable[T]]) -> Optional[T]:
+            async with semaphore:
+                context = await new_context(storage_state=storage_state)
+                try:
+                    page = await context.new_page()
+                    page.set_default_timeout(60000)
+                    return await job(page)
+                except Exception as e:
+                    logger.error(f"Parallel browser job failed: {e}")
+                    return None
+                finally:
+                    await context.close()
+        
+        return await asyncio.gather(*(run(job) for job in jobs))
+    
     async def get_applications(self) -> List[Dict]:
         """Get list of available applications in Clever portal"""
         try:
@@ -126,52 +264,11 @@ class CleverService:
                 return []
             
             # Navigate to applications page
-            await self.page.goto('https://clever.com/applications')
-            await self.page.wait_for_timeout(5000)
+            await self.page.goto('https://clever.com/applications', wait_until='domcontentloaded')
+            await self._wait_for_selector('[data-testid="app-card"], .app-card, .application, .grid-item, .tile, .app-tile')
             
             # Extract application information using multiple selector strategies
-            apps = await self.page.evaluate('''() => {
-                const apps = [];
-                
-                // Strategy 1: Look for app cards
-                const appCards = document.querySelectorAll('[data-testid="app-card"], .app-card, [class*="app"], .application');
-                
-                for (const card of appCards) {
-                    const nameElement = card.querySelector('h3, h4, .app-name, [class*="name"], .title');
-                    const descriptionElement = card.querySelector('p, .app-description, [class*="description"]');
-                    const linkElement = card.querySelector('a');
-                    
-                    if (nameElement) {
-                        apps.push({
-                            name: nameElement.innerText?.trim() || '',
-                            description: descriptionElement?.innerText?.trim() || '',
-                            link: linkElement?.href || '',
-                            icon: linkElement?.querySelector('img')?.src || ''
-                        });
-                    }
-                }
-                
-                // Strategy 2: Look for grid items
-                if (apps.length === 0) {
-                    const gridItems = document.querySelectorAll('.grid-item, .tile, .app-tile');
-                    for (const item of gridItems) {
-                        const link = item.querySelector('a');
-                        if (link) {
-                            const name = link.innerText?.trim() || link.getAttribute('title') || '';
-                            if (name) {
-                                apps.push({
-                                    name: name,
-                                    description: '',
-                                    link: link.href,
-                                    icon: link.querySelector('img')?.src || ''
-                                });
-                            }
-                        }
-                    }
-                }
-                
-                return apps;
-            }''')
+            apps = await self.page.evaluate(_APPLICATIONS_JS)
             
             # Filter out empty results
             apps = [app for app in apps if app.get('name')]
@@ -190,14 +287,10 @@ class CleverService:
                 return False
             
             apps = await self.get_applications()
-            target_app = next(
-                (app for app in apps if app_name.lower() in app['name'].lower()),
-                None
-            )
+            target_app = self._find_by_name(apps, 'name', app_name)
             
             if target_app and target_app.get('link'):
-                await self.page.goto(target_app['link'])
-                await self.page.wait_for_timeout(8000)
+                await self.page.goto(target_app['link'], wait_until='domcontentloaded')
                 logger.info(f"Launched application: {app_name}")
                 return True
             
@@ -208,8 +301,31 @@ class CleverService:
             logger.error(f"Error launching application {app_name}: {e}")
             return False
     
+    @staticmethod
+    def _find_by_name(items: List[Dict], key: str, name: str) -> Optional[Dict]:
+        """Find the first item whose field contains the name, ignoring case"""
+        matches = re.compile(re.escape(name), re.IGNORECASE).search
+        return next((item for item in items if matches(item.get(key) or '')), None)
+    
+    async def _query_first(self, selectors: List[str]):
+        """Return the element for the first selector, in priority order, that matches anything"""
+        for selector in selectors:
+            element = await self.page.query_selector(selector)
+            if element:
+                return element
+        return None
+    
+    async def _wait_for_selector(self, selector: str, timeout: int = 10000) -> bool:
+        """Wait for a selector to become visible, returning False on timeout"""
+        try:
+            await self.page.wait_for_selector(selector, state='visible', timeout=timeout)
+            return True
+        except PlaywrightTimeoutError:
+            logger.warning(f"Timed out waiting for selector: {selector}")
+            return False
+    
     async def get_current_page_content(self) -> Optional[str]:
-        """Get the current page content for debugging"""
+        """Get the current page content (debugging only; serializes the whole page)"""
         try:
             if self.page:
                 return await self.page.content()
@@ -219,11 +335,13 @@ class CleverService:
             return None
     
     async def close(self):
-        """Close the browser"""
+        """Close the browser context (the shared browser stays running)"""
         try:
-            if self.browser:
-                await self.browser.close()
+            if self.context:
+                await self.context.close()
+                self.context = None
+                self.page = None
                 self.is_logged_in = False
-                logger.info("Clever browser closed")
+                logger.info("Clever browser context closed")
         except Exception as e:
             logger.error(f"Error closing browser: {e}")
@@ -1,10 +1,15 @@
+from playwright.async_api import Page, TimeoutError as PlaywrightTimeoutError
 from src.services.clever import CleverService
 import asyncio
+from functools import partial
 from typing import List, Dict, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+# JSON endpoint behind the student dashboard; it accepts the Clever SSO session cookies
+_ASSIGNMENTS_API_URL = 'https://edpuzzle.com/api/v3/assignments?limit=50'
+
 class EdpuzzleService(CleverService):
     def __init__(self):
         super().__init__()
@@ -15,8 +20,11 @@ class EdpuzzleService(CleverService):
         try:
             success = await self.launch_application('edpuzzle')
             if success:
-                # Wait for Edpuzzle to load completely
-                await self.page.wait_for_timeout(10000)
+                # Wait for the Clever launch to redirect to Edpuzzle
+                try:
+                    await self.page.wait_for_url(lambda url: 'edpuzzle.com' in url, timeout=15000)
+                except PlaywrightTimeoutError:
+                    logger.warning("Timed out waiting for Edpuzzle to load")
                 
                 # Check if we're on an Edpuzzle page
                 current_url = self.page.url
@@ -25,9 +33,11 @@ class EdpuzzleService(CleverService):
                     logger.info("Successfully navigated to Edpuzzle")
                     return True
                 else:
-                    # Try to detect Edpuzzle by page content
-                    page_content = await self.page.content()
-                    if 'edpuzzle' in page_content.lower():
+                    # Try to detect Edpuzzle by title or markers, without serializing the whole page
+                    title = (await self.page.title()).lower()
+                    if 'edpuzzle' in title or await self.page.query_selector(
+                        '[class*="edpuzzle" i], [data-edpuzzle], meta[name*="edpuzzle" i]'
+                    ):
                         self.edpuzzle_loaded = True
                         return True
             
@@ -43,14 +53,20 @@ class EdpuzzleService(CleverService):
             if not self.edpuzzle_loaded and not await self.navigate_to_edpuzzle():
                 return []
             
+            api_assignments = await self._api_assignments()
+            if api_assignments is not None:
+                assignments = [self._assignment_from_api(item) for item in api_assignments]
+                assignments = [assignment for assignment in assignments if assignment.get('title')]
+                logger.info(f"Found {len(assignments)} Edpuzzle assignments via API")
+                return assignments
+            
             # Wait for assignments to load
-            await self.page.wait_for_timeout(5000)
+            await self._wait_for_selector('.assignment-item, .video-assignment, [class*="assignment"]')
             
             # Try multiple strategies to find video assignments
             assignments = await self.page.evaluate('''() => {
                 const assignments = [];
                 
-                // Strategy 1: Look for assignment cards
                 const assignmentSelectors = [
                     '.assignment-item',
                     '.video-assignment',
@@ -58,25 +74,33 @@ class EdpuzzleService(CleverService):
                     '.media-assignment',
                     '.task-item'
                 ];
+                const videoSelector = '.video-thumbnail, [class*="video"], .media-item';
                 
-                for (const selector of assignmentSelectors) {
-                    const elements = document.querySelectorAll(selector);
+                // Scan the DOM once for both strategies, bucketing assignment cards by the
+                // highest-priority selector they match
+                const buckets = assignmentSelectors.map(() => []);
+                const videoElements = [];
+                for (const element of document.querySelectorAll(assignmentSelectors.join(', ') + ', ' + videoSelector)) {
+                    const index = assignmentSelectors.findIndex(selector => element.matches(selector));
+                    if (index >= 0) buckets[index].push(element);
+                    if (element.matches(videoSelector)) videoElements.push(element);
+                }
+                
+                const text = (element, selector) => element.querySelector(selector)?.innerText?.trim() || '';
+                
+                // Strategy 1: Look for assignment cards
+                for (const elements of buckets) {
                     for (const element of elements) {
-                        const titleElement = element.querySelector('.video-title, .title, h3, h4, [class*="title"]');
-                        const teacherElement = element.querySelector('.teacher-name, .instructor, [class*="teacher"]');
-                        const dueDateElement = element.querySelector('.due-date, .date, [class*="due"]');
-                        const questionsElement = element.querySelector('.questions, .questions-count, [class*="question"]');
-                        const progressElement = element.querySelector('.progress, .completion, [class*="progress"]');
-                        const linkElement = element.querySelector('a');
+                        const title = text(element, '.video-title, .title, h3, h4, [class*="title"]');
                         
-                        if (titleElement) {
+                        if (title) {
                             assignments.push({
-                                title: titleElement.innerText?.trim() || '',
-                                teacher: teacherElement?.innerText?.trim() || '',
-                                due_date: dueDateElement?.innerText?.trim() || '',
-                                questions_count: questionsElement?.innerText?.trim() || '',
-                                progress: progressElement?.innerText?.trim() || 'Not Started',
-                                link: linkElement?.href || '',
+                                title: title,
+                                teacher: text(element, '.teacher-name, .instructor, [class*="teacher"]'),
+                                due_date: text(element, '.due-date, .date, [class*="due"]'),
+                                questions_count: text(element, '.questions, .questions-count, [class*="question"]'),
+                                progress: text(element, '.progress, .completion, [class*="progress"]') || 'Not Started',
+                                link: element.querySelector('a')?.href || '',
                                 platform: 'Edpuzzle'
                             });
                         }
@@ -87,10 +111,8 @@ class EdpuzzleService(CleverService):
                 
                 // Strategy 2: Look for video thumbnails
                 if (assignments.length === 0) {
-                    const videoElements = document.querySelectorAll('.video-thumbnail, [class*="video"], .media-item');
                     for (const element of videoElements) {
                         const titleElement = element.querySelector('.title, h3, h4, [class*="title"]');
-                        const contextElement = element.closest('.assignment, .task') || element.parentElement;
                         
                         if (titleElement) {
                             assignments.push({
@@ -119,6 +141,49 @@ class EdpuzzleService(CleverService):
             logger.error(f"Error getting Edpuzzle assignments: {e}")
             return []
     
+    async def _api_assignments(self) -> Optional[List[Dict]]:
+        """Fetch assignments from Edpuzzle's JSON API, or None if the page must be scraped instead"""
+        try:
+            # The context's request client shares the browser session's cookies
+            response = await self.page.context.request.get(_ASSIGNMENTS_API_URL)
+            if not response.ok:
+                logger.warning(f"Edpuzzle API returned {response.status}, falling back to page scraping")
+                return None
+            
+            data = await response.json()
+            if isinstance(data, dict):
+                # Only a payload that actually carries a list may suppress the page scrape
+                key = next((key for key in ('assignments', 'data') if key in data), None)
+                if key is None:
+                    logger.warning("Unexpected Edpuzzle API payload, falling back to page scraping")
+                    return None
+                data = data[key]
+            if not isinstance(data, list):
+                return None
+            return [item for item in data if isinstance(item, dict)]
+            
+        except Exception as e:
+            logger.warning(f"Edpuzzle API request failed, falling back to page scraping: {e}")
+            return None
+    
+    @staticmethod
+    def _assignment_from_api(item: Dict) -> Dict:
+        """Map an Edpuzzle API assignment onto the scraped assignment fields"""
+        media = item.get('media') or {}
+        teacher = item.get('teacher') or {}
+        questions = media.get('questions')
+        assignment_id = item.get('_id') or item.get('id')
+        
+        return {
+            'title': media.get('title') or item.get('title') or '',
+            'teacher': teacher.get('name', '') if isinstance(teacher, dict) else '',
+            'due_date': item.get('dueDate') or '',
+            'questions_count': str(len(questions)) if isinstance(questions, list) else '',
+            'progress': 'Done' if item.get('completed') else 'Not Started',
+            'link': f'https://edpuzzle.com/assignments/{assignment_id}' if assignment_id else '',
+            'platform': 'Edpuzzle'
+        }
+    
     async def watch_video_assignment(self, assignment_title: str) -> bool:
         """Start watching a video assignment"""
         try:
@@ -126,14 +191,10 @@ class EdpuzzleService(CleverService):
                 return False
             
             assignments = await self.get_video_assignments()
-            target_assignment = next(
-                (assignment for assignment in assignments if assignment_title.lower() in assignment['title'].lower()),
-                None
-            )
+            target_assignment = self._find_by_name(assignments, 'title', assignment_title)
             
             if target_assignment and target_assignment.get('link'):
-                await self.page.goto(target_assignment['link'])
-                await self.page.wait_for_timeout(5000)
+                await self.page.goto(target_assignment['link'], wait_until='domcontentloaded')
                 logger.info(f"Started video assignment: {assignment_title}")
                 return True
             
@@ -164,12 +225,62 @@ class EdpuzzleService(CleverService):
             logger.error(f"Error answering video questions: {e}")
             return False
     
+    async def answer_video_questions_bulk(self, answers_by_title: Dict[str, Dict]) -> Dict[str, bool]:
+        """
+        Answer questions in several video assignments concurrently (placeholder implementation)
+        
+        Args:
+            answers_by_title: Answers for each assignment, keyed by assignment title
+            
+        Returns:
+            Whether each assignment was opened, keyed by assignment title
+        """
+        results = {title: False for title in answers_by_title}
+        try:
+            assignments = await self.get_video_assignments()
+            
+            links = {}
+            for title in answers_by_title:
+                target_assignment = self._find_by_name(assignments, 'title', title)
+                if target_assignment and target_assignment.get('link'):
+                    links[title] = target_assignment['link']
+            
+            # Each assignment is worked in its own browser context
+            outcomes = await self.run_parallel([
+                partial(self._open_video_assignment, title, link) for title, link in links.items()
+            ])
+            results.update({title: bool(outcome) for title, outcome in zip(links, outcomes)})
+            return results
+            
+        except Exception as e:
+            logger.error(f"Error answering video questions in bulk: {e}")
+            return results
+    
+    async def _open_video_assignment(self, assignment_title: str, link: str, page: Page) -> bool:
+        """Open a video assignment on the given page"""
+        await page.goto(link, wait_until='domcontentloaded')
+        logger.info(f"Attempting to answer questions for: {assignment_title}")
+        # As in answer_video_questions, answering depends on Edpuzzle's question interface
+        return True
+    
     async def get_video_progress(self) -> List[Dict]:
         """Get progress on video assignments"""
         try:
             if not self.edpuzzle_loaded and not await self.navigate_to_edpuzzle():
                 return []
             
+            api_assignments = await self._api_assignments()
+            if api_assignments is not None:
+                return [
+                    {
+                        'title': assignment['title'],
+                        'progress': assignment['progress'],
+                        'element': 'api'
+                    }
+                    for assignment in map(self._assignment_from_api, api_assignments)
+                    if assignment['title']
+                ]
+            
             progress_data = await self.page.evaluate('''() => {
                 const progress = [];
                 const progressSelectors = [
@@ -1,31 +1,111 @@
-import pickle
+import asyncio
 import os
+import random
+import threading
+from urllib.parse import quote
+from datetime import datetime
+from cachetools import TTLCache
+import httplib2
+import httpx
+import orjson
 from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.model import JsonModel
 from src.config.settings import settings
 from src.models.schemas import Assignment, Course
-from typing import List, Optional
+from src.utils.helpers import write_file_atomic
+from typing import List, Dict, Optional, Tuple, Any
 import logging
 
 logger = logging.getLogger(__name__)
 
+# REST endpoint for the list calls served over the shared HTTP/2 client
+_CLASSROOM_API_URL = 'https://classroom.googleapis.com'
+
+# Maximum sub-requests the Classroom API accepts in one batch call
+_BATCH_LIMIT = 50
+
+# Rate limit and transient server errors worth retrying
+_RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Partial-response masks limited to the fields the models use
+_COURSE_FIELDS = 'courses(id,name,section,description,enrollmentCode),nextPageToken'
+_COURSEWORK_FIELDS = 'courseWork(id,title,description,dueDate,dueTime,courseId,state,maxPoints,workType),nextPageToken'
+
+# Decodes every Google API response body with orjson instead of the stdlib json module
+class _OrjsonModel(JsonModel):
+    """JsonModel that decodes response bodies with orjson"""
+    
+    def deserialize(self, content):
+        try:
+            body = orjson.loads(content)
+        except orjson.JSONDecodeError:
+            return content.decode('utf-8') if isinstance(content, bytes) else content
+        if self._data_wrapper and 'data' in body:
+            body = body['data']
+        return body
+
+# API clients built per credentials object, shared by all service instances
+_service_cache: Dict[Tuple[str, str, int], Tuple[Any, Any]] = {}
+_service_cache_lock = threading.Lock()
+
+def build_service(api: str, version: str, creds) -> Any:
+    """Build a Google API client from the bundled discovery document, reusing earlier builds"""
+    key = (api, version, id(creds))
+    with _service_cache_lock:
+        cached = _service_cache.get(key)
+        # The credentials are kept alongside the client so a reused id() cannot match
+        if cached is not None and cached[0] is creds:
+            return cached[1]
+        
+        service = build(api, version, credentials=creds, static_discovery=True, cache_discovery=False,
+                        model=_OrjsonModel())
+        _service_cache[key] = (creds, service)
+        return service
+
 class GoogleClassroomService:
+    # Parsed token shared by all instances, keyed by the token file's mtime
+    _creds_cache: Optional[Tuple[float, Any]] = None
+    # Caps concurrent Google API calls across all instances (Classroom and Docs) to stay within per-user quotas
+    _api_semaphore = asyncio.Semaphore(settings.GOOGLE_API_CONCURRENCY)
+    
     def __init__(self):
         self.creds = None
         self.service = None
-        self.authenticate()
+        self._thread_local = threading.local()
+        self._http_pool = []
+        self._http_pool_lock = threading.Lock()
+        self._rest = None
+        # Short-lived read caches; the course list expires quickly so changes show up
+        self._courses_cache = TTLCache(maxsize=1, ttl=60)
+        self._details_cache = TTLCache(maxsize=512, ttl=300)
+        # Authentication is deferred until the first API call
     
     def authenticate(self) -> bool:
         """Authenticate with Google Classroom API"""
         try:
-            # Check if token exists and is valid
+            # Check if token exists and is valid, reusing the parsed token while the file is unchanged
             if os.path.exists(settings.GOOGLE_TOKEN_FILE):
-                with open(settings.GOOGLE_TOKEN_FILE, 'rb') as token:
-                    self.creds = pickle.load(token)
+                mtime = os.stat(settings.GOOGLE_TOKEN_FILE).st_mtime
+                cache = GoogleClassroomService._creds_cache
+                if cache and cache[0] == mtime:
+                    self.creds = cache[1]
+                else:
+                    try:
+                        self.creds = Credentials.from_authorized_user_file(
+                            settings.GOOGLE_TOKEN_FILE, list(settings.SCOPES))
+                        GoogleClassroomService._creds_cache = (mtime, self.creds)
+                    except ValueError as e:
+                        # Unreadable tokens (e.g. a legacy token.pickle) are replaced by a fresh sign-in
+                        logger.warning(f"Ignoring unreadable Google token file {settings.GOOGLE_TOKEN_FILE}: {e}")
+                        self.creds = None
             
             # If there are no (valid) credentials available, let the user log in.
+            # The token file is only rewritten here, when the credentials changed.
             if not self.creds or not self.creds.valid:
                 if self.creds and self.creds.expired and self.creds.refresh_token:
                     self.creds.refresh(Request())
@@ -35,14 +115,16 @@ class GoogleClassroomService:
                         return False
                     
                     flow = InstalledAppFlow.from_client_secrets_file(
-                        settings.GOOGLE_CLIENT_SECRET_FILE, settings.SCOPES)
+                        settings.GOOGLE_CLIENT_SECRET_FILE, list(settings.SCOPES))
                     self.creds = flow.run_local_server(port=0)
                 
-                # Save the credentials for the next run
-                with open(settings.GOOGLE_TOKEN_FILE, 'wb') as token:
-                    pickle.dump(self.creds, token)
+                # Save the credentials for the next run, swapping the file in atomically
+                write_file_atomic(settings.GOOGLE_TOKEN_FILE, self.creds.to_json())
+                GoogleClassroomService._creds_cache = (
+                    os.stat(settings.GOOGLE_TOKEN_FILE).st_mtime, self.creds
+                )
             
-            self.service = build('classroom', 'v1', credentials=self.creds)
+            self.service = build_service('classroom', 'v1', self.creds)
             logger.info("Successfully authenticated with Google Classroom")
             return True
             
@@ -50,101 +132,297 @@ class GoogleClassroomService:
             logger.error(f"Google Classroom authentication failed: {e}")
             return False
     
-    def get_courses(self) -> List[Course]:
+    def _authorized_http(self) -> AuthorizedHttp:
+        """Get an authorized HTTP transport for the current thread (httplib2 is not thread-safe)"""
+        http = getattr(self._thread_local, 'http', None)
+        if http is None or http.credentials is not self.creds:
+            stale = http
+            http = AuthorizedHttp(self.creds, http=httplib2.Http())
+            self._thread_local.http = http
+            with self._http_pool_lock:
+                if stale in self._http_pool:
+                    self._http_pool.remove(stale)
+                self._http_pool.append(http)
+            if stale is not None:
+                stale.http.close()
+        return http
+    
+    async def close(self) -> None:
+        """Close the keep-alive connections held by the REST client and every thread's transport"""
+        with self._http_pool_lock:
+            pool, self._http_pool = self._http_pool, []
+        for http in pool:
+            try:
+                http.http.close()
+            except Exception as e:
+                logger.warning(f"Error closing Google API connection: {e}")
+        
+        if self._rest is not None:
+            await self._rest.aclose()
+            self._rest = None
+    
+    async def _rest_get(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """GET a Classroom REST resource over one shared keep-alive HTTP/2 connection"""
+        if self._rest is None:
+            self._rest = httpx.AsyncClient(
+                base_url=_CLASSROOM_API_URL,
+                http2=True,
+                timeout=httpx.Timeout(10.0, connect=5.0)
+            )
+        
+        for attempt in range(settings.GOOGLE_API_MAX_RETRIES + 1):
+            if not self.creds.valid:
+                await asyncio.to_thread(self.creds.refresh, Request())
+            
+            async with self._api_semaphore:
+                response = await self._rest.get(
+                    path,
+                    params=params,
+                    headers={'Authorization': f'Bearer {self.creds.token}'}
+                )
+            if response.status_code not in _RETRYABLE_STATUSES or attempt == settings.GOOGLE_API_MAX_RETRIES:
+                break
+            delay = self._retry_delay(response.headers.get('retry-after'), attempt)
+            logger.warning(f"Google API returned {response.status_code}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        
+        response.raise_for_status()
+        return orjson.loads(response.content)
+    
+    async def _rest_get_all(self, path: str, params: Dict[str, Any], key: str) -> List[Dict[str, Any]]:
+        """GET every page of a Classroom REST list, following nextPageToken"""
+        items: List[Dict[str, Any]] = []
+        page_token = None
+        while True:
+            page = await self._rest_get(path, {**params, 'pageToken': page_token} if page_token else params)
+            items.extend(page.get(key, []))
+            page_token = page.get('nextPageToken')
+            if not page_token:
+                return items
+    
+    async def _execute(self, request):
+        """Execute an API request in a worker thread so the event loop is not blocked"""
+        for attempt in range(settings.GOOGLE_API_MAX_RETRIES + 1):
+            try:
+                # The transport is looked up inside the worker thread, as httplib2 is not thread-safe
+                async with self._api_semaphore:
+                    return await asyncio.to_thread(lambda: request.execute(http=self._authorized_http()))
+            except HttpError as error:
+                if error.resp.status not in _RETRYABLE_STATUSES or attempt == settings.GOOGLE_API_MAX_RETRIES:
+                    raise
+                delay = self._retry_delay(error.resp.get('retry-after'), attempt)
+                logger.warning(f"Google API returned {error.resp.status}, retrying in {delay:.1f}s")
+                # Sleep outside the semaphore so other calls can use the slot
+                await asyncio.sleep(delay)
+    
+    async def _execute_batched(self, service, callback, requests: List[Tuple[str, Any]]) -> None:
+        """
+        Send (request_id, request) pairs in as few batch HTTP calls as possible
+        
+        Args:
+            service: Client whose batch endpoint the requests belong to
+            callback: Called with (request_id, response, exception) for each request
+            requests: The requests to send, with ids unique within the call
+        """
+        pending = list(requests)
+        for attempt in range(settings.GOOGLE_API_MAX_RETRIES + 1):
+            final_attempt = attempt == settings.GOOGLE_API_MAX_RETRIES
+            requests_by_id = dict(pending)
+            retry: List[Tuple[str, Any]] = []
+            retry_delays: List[float] = []
+            
+            def handle(request_id, response, exception):
+                # A rate-limited or failed sub-request does not fail its batch, so retry it here
+                if (isinstance(exception, HttpError) and exception.resp.status in _RETRYABLE_STATUSES
+                        and not final_attempt):
+                    retry.append((request_id, requests_by_id[request_id]))
+                    retry_delays.append(self._retry_delay(exception.resp.get('retry-after'), attempt))
+                    return
+                callback(request_id, response, exception)
+            
+            batches = []
+            for start in range(0, len(pending), _BATCH_LIMIT):
+                batch = service.new_batch_http_request(callback=handle)
+                for request_id, request in pending[start:start + _BATCH_LIMIT]:
+                    batch.add(request, request_id=request_id)
+                batches.append(batch)
+            await asyncio.gather(*(self._execute(batch) for batch in batches))
+            
+            if not retry:
+                return
+            delay = max(retry_delays)
+            logger.warning(f"Retrying {len(retry)} batched Google API requests in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            pending = retry
+    
+    @staticmethod
+    def _retry_delay(retry_after: Optional[str], attempt: int) -> float:
+        """Seconds to wait before retrying, preferring the server's Retry-After"""
+        try:
+            delay = float(retry_after)
+        except (TypeError, ValueError):
+            # Exponential backoff with jitter so concurrent callers spread out
+            delay = 2 ** attempt + random.random()
+        return min(delay, settings.GOOGLE_API_MAX_BACKOFF)
+    
+    async def get_courses(self) -> List[Course]:
         """Get list of courses from Google Classroom"""
+        cached = self._courses_cache.get('courses')
+        if cached is not None:
+            return list(cached)
+        
         try:
             if not self.service:
-                if not self.authenticate():
+                if not await asyncio.to_thread(self.authenticate):
                     return []
             
-            results = self.service.courses().list(
-                pageSize=20,
-                courseStates=['ACTIVE']
-            ).execute()
-            
-            courses_data = results.get('courses', [])
+            course_items = await self._rest_get_all('/v1/courses', {
+                'pageSize': 100,
+                'courseStates': 'ACTIVE',
+                'fields': _COURSE_FIELDS
+            }, 'courses')
             
-            courses = []
-            for course_data in courses_data:
-                course = Course(
+            # Google's payloads are trusted, so skip per-row validation
+            courses = [
+                Course.model_construct(
                     id=course_data['id'],
                     name=course_data['name'],
                     section=course_data.get('section', ''),
                     description=course_data.get('description', ''),
                     enrollment_code=course_data.get('enrollmentCode', '')
                 )
-                courses.append(course)
+                for course_data in course_items
+            ]
             
             logger.info(f"Retrieved {len(courses)} courses")
-            return courses
+            self._courses_cache['courses'] = courses
+            return list(courses)
             
-        except HttpError as error:
+        except httpx.HTTPError as error:
             logger.error(f"Google Classroom API error: {error}")
             return []
         except Exception as e:
             logger.error(f"Unexpected error getting courses: {e}")
             return []
     
-    def get_assignments(self, course_id: str) -> List[Assignment]:
+    async def get_assignments(self, course_id: str) -> List[Assignment]:
         """Get assignments for a specific course"""
         try:
             if not self.service:
-                if not self.authenticate():
+                if not await asyncio.to_thread(self.authenticate):
                     return []
             
             # Get course work
-            coursework_result = self.service.courses().courseWork().list(
-                courseId=course_id,
-                pageSize=20,
-                orderBy='dueDate desc'
-            ).execute()
-            
-            assignments_data = coursework_result.get('courseWork', [])
-            
-            assignments = []
-            for work in assignments_data:
-                # Parse due date if available
-                due_date = None
-                if work.get('dueDate'):
-                    due_date_str = f"{work['dueDate']['year']}-{work['dueDate']['month']}-{work['dueDate']['day']}"
-                    if work.get('dueTime'):
-                        due_date_str += f" {work['dueTime']['hours']}:{work['dueTime']['minutes']}:00"
-                    due_date = due_date_str
-                
-                assignment = Assignment(
-                    id=work['id'],
-                    title=work['title'],
-                    description=work.get('description', ''),
-                    due_date=due_date,
-                    course_name=work.get('courseId', ''),
-                    status=work.get('state', 'PUBLISHED'),
-                    max_points=work.get('maxPoints'),
-                    work_type=work.get('workType', 'ASSIGNMENT')
-                )
-                assignments.append(assignment)
+            coursework = await self._rest_get_all(f"/v1/courses/{quote(course_id, safe='')}/courseWork", {
+                'pageSize': 100,
+                'orderBy': 'dueDate desc',
+                'fields': _COURSEWORK_FIELDS
+            }, 'courseWork')
+            
+            assignments = [self._to_assignment(work) for work in coursework]
             
             logger.info(f"Retrieved {len(assignments)} assignments for course {course_id}")
             return assignments
             
-        except HttpError as error:
+        except httpx.HTTPError as error:
             logger.error(f"Google Classroom API error for course {course_id}: {error}")
             return []
         except Exception as e:
             logger.error(f"Unexpected error getting assignments: {e}")
             return []
     
-    def get_assignment_details(self, course_id: str, assignment_id: str) -> Optional[dict]:
+    async def get_assignments_for_courses(self, course_ids: List[str]) -> Dict[str, List[Assignment]]:
+        """Get assignments for several courses using batched API requests"""
+        results: Dict[str, List[Assignment]] = {course_id: [] for course_id in course_ids}
+        try:
+            if not self.service:
+                if not await asyncio.to_thread(self.authenticate):
+                    return results
+            
+            def handle_response(course_id, response, exception):
+                if exception is not None:
+                    logger.error(f"Google Classroom API error for course {course_id}: {exception}")
+                    return
+                results[course_id].extend(self._to_assignment(work) for work in response.get('courseWork', []))
+                if response.get('nextPageToken'):
+                    next_page_tokens[course_id] = response['nextPageToken']
+            
+            # One HTTP round-trip per batch instead of one per course; courses with more
+            # pages are fetched together in follow-up rounds
+            page_tokens: Dict[str, Optional[str]] = dict.fromkeys(course_ids)
+            while page_tokens:
+                next_page_tokens: Dict[str, Optional[str]] = {}
+                await self._execute_batched(
+                    self.service,
+                    handle_response,
+                    [
+                        (course_id, self.service.courses().courseWork().list(
+                            courseId=course_id,
+                            pageSize=100,
+                            orderBy='dueDate desc',
+                            fields=_COURSEWORK_FIELDS,
+                            **({'pageToken': page_token} if page_token else {})
+                        ))
+                        for course_id, page_token in page_tokens.items()
+                    ]
+                )
+                page_tokens = next_page_tokens
+            
+            logger.info(f"Retrieved assignments for {len(course_ids)} courses")
+            return results
+            
+        except HttpError as error:
+            logger.error(f"Google Classroom batch API error: {error}")
+            return results
+        except Exception as e:
+            logger.error(f"Unexpected error getting assignments for courses: {e}")
+            return results
+    
+    def _to_assignment(self, work: dict) -> Assignment:
+        """Build an Assignment from a Classroom course work item"""
+        # Google's payloads are trusted, so skip per-row validation
+        return Assignment.model_construct(
+            id=work['id'],
+            title=work['title'],
+            description=work.get('description', ''),
+            due_date=self._due_date(work),
+            course_name=work.get('courseId', ''),
+            status=work.get('state', 'PUBLISHED'),
+            max_points=work.get('maxPoints'),
+            work_type=work.get('workType', 'ASSIGNMENT')
+        )
+    
+    @staticmethod
+    def _due_date(work: dict) -> Optional[str]:
+        """Format a course work item's due date as ISO 8601, if it has one"""
+        due_date = work.get('dueDate')
+        if not due_date:
+            return None
+        
+        # Classroom omits zero-valued fields, e.g. dueTime {"hours": 9} for 09:00
+        due_time = work.get('dueTime') or {}
+        return datetime(
+            due_date['year'], due_date['month'], due_date['day'],
+            due_time.get('hours', 0), due_time.get('minutes', 0)
+        ).isoformat()
+    
+    async def get_assignment_details(self, course_id: str, assignment_id: str) -> Optional[dict]:
         """Get detailed information about a specific assignment"""
+        cached = self._details_cache.get((course_id, assignment_id))
+        if cached is not None:
+            return cached
+        
         try:
             if not self.service:
-                if not self.authenticate():
+                if not await asyncio.to_thread(self.authenticate):
                     return None
             
-            assignment = self.service.courses().courseWork().get(
+            assignment = await self._execute(self.service.courses().courseWork().get(
                 courseId=course_id,
                 id=assignment_id
-            ).execute()
+            ))
             
+            self._details_cache[(course_id, assignment_id)] = assignment
             return assignment
             
         except HttpError as error:
@@ -154,9 +432,10 @@ class GoogleClassroomService:
             logger.error(f"Unexpected error getting assignment details: {e}")
             return None
     
-    def submit_assignment(self, course_id: str, assignment_id: str, submission_data: dict) -> bool:
+    async def submit_assignment(self, course_id: str, assignment_id: str, submission_data: dict) -> bool:
         """Submit an assignment (placeholder - requires proper implementation)"""
         try:
+            self._details_cache.pop((course_id, assignment_id), None)
             logger.info(f"Submission attempt for assignment {assignment_id} in course {course_id}")
             # Note: Actual submission implementation would require proper file handling
             # and compliance with Google Classroom API guidelines
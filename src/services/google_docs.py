@@ -1,61 +1,63 @@
-from googleapiclient.discovery import build
+import asyncio
+from cachetools import TTLCache
 from googleapiclient.errors import HttpError
-from src.services.google_classroom import GoogleClassroomService
+from src.services.google_classroom import GoogleClassroomService, build_service
 from src.config.settings import settings
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Maximum sub-requests sent in one batch HTTP call
+# Partial-response masks: the server returns only what callers read
+_CREATED_DOCUMENT_FIELDS = 'documentId,title,revisionId'
+_DOCUMENT_TEXT_FIELDS = 'revisionId,body/content/paragraph/elements/textRun/content'
+_CREATED_PRESENTATION_FIELDS = 'presentationId,title,revisionId'
+
 class GoogleDocsService(GoogleClassroomService):
     def __init__(self):
         super().__init__()
         self.docs_service = None
         self.slides_service = None
         self.drive_service = None
-        self.initialize_services()
+        # Document text keyed by document id, stored with the revision it was read at
+        self._content_cache = TTLCache(maxsize=512, ttl=3600)
     
     def initialize_services(self):
         """Initialize Google Docs, Slides, and Drive services"""
         try:
-            if self.creds:
-                self.docs_service = build('docs', 'v1', credentials=self.creds)
-                self.slides_service = build('slides', 'v1', credentials=self.creds)
-                self.drive_service = build('drive', 'v3', credentials=self.creds)
-                logger.info("Google Docs, Slides, and Drive services initialized")
+            if not self.creds and not self.authenticate():
+                return
+            
+            self.docs_service = build_service('docs', 'v1', self.creds)
+            self.slides_service = build_service('slides', 'v1', self.creds)
+            self.drive_service = build_service('drive', 'v3', self.creds)
+            logger.info("Google Docs, Slides, and Drive services initialized")
         except Exception as e:
             logger.error(f"Failed to initialize Google services: {e}")
     
-    def create_document(self, title: str, content: str = "") -> Optional[Dict[str, Any]]:
+    async def create_document(self, title: str, content: str = "") -> Optional[Dict[str, Any]]:
         """Create a new Google Document"""
         try:
             if not self.docs_service:
-                self.initialize_services()
+                await asyncio.to_thread(self.initialize_services)
                 if not self.docs_service:
                     return None
             
             # Create the document
-            document = self.docs_service.documents().create(
-                body={'title': title}
-            ).execute()
+            document = await self._execute(self.docs_service.documents().create(
+                body={'title': title},
+                fields=_CREATED_DOCUMENT_FIELDS
+            ))
             
             document_id = document['documentId']
             
             # Add content if provided
             if content:
-                requests = [
-                    {
-                        'insertText': {
-                            'location': {'index': 1},
-                            'text': content
-                        }
-                    }
-                ]
-                
-                self.docs_service.documents().batchUpdate(
+                await self._execute(self.docs_service.documents().batchUpdate(
                     documentId=document_id,
-                    body={'requests': requests}
-                ).execute()
+                    body={'requests': self._insert_text_requests(content)}
+                ))
             
             logger.info(f"Created document: {title} (ID: {document_id})")
             return document
@@ -67,25 +69,115 @@ class GoogleDocsService(GoogleClassroomService):
             logger.error(f"Error creating document: {e}")
             return None
     
-    def update_document_content(self, document_id: str, content: str) -> bool:
-        """Update content of an existing Google Document"""
+    async def bulk_create_documents(self, documents: List[Tuple[str, str]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Create several Google Documents using batched API requests
+        
+        Args:
+            documents: (title, content) pairs for the documents to create
+            
+        Returns:
+            The created documents in input order, or None for any that failed
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(documents)
         try:
             if not self.docs_service:
-                return False
+                await asyncio.to_thread(self.initialize_services)
+                if not self.docs_service:
+                    return results
             
-            requests = [
-                {
-                    'insertText': {
-                        'location': {'index': 1},
-                        'text': content
-                    }
+            def handle_create(request_id, response, exception):
+                if exception is not None:
+                    logger.error(f"Google Docs API error creating document: {exception}")
+                    return
+                results[int(request_id)] = response
+            
+            await self._execute_batched(
+                self.docs_service,
+                handle_create,
+                [
+                    (str(index), self.docs_service.documents().create(
+                        body={'title': title},
+                        fields=_CREATED_DOCUMENT_FIELDS
+                    ))
+                    for index, (title, _) in enumerate(documents)
+                ]
+            )
+            
+            def handle_insert(request_id, response, exception):
+                if exception is not None:
+                    logger.error(f"Google Docs API error adding content: {exception}")
+            
+            # Fill every created document in a second batch
+            await self._execute_batched(
+                self.docs_service,
+                handle_insert,
+                [
+                    (str(index), self.docs_service.documents().batchUpdate(
+                        documentId=document['documentId'],
+                        body={'requests': self._insert_text_requests(content)}
+                    ))
+                    for index, (document, (_, content)) in enumerate(zip(results, documents))
+                    if document and content
+                ]
+            )
+            
+            logger.info(f"Created {sum(1 for document in results if document)} of {len(documents)} documents")
+            return results
+            
+        except HttpError as error:
+            logger.error(f"Google Docs batch API error: {error}")
+            return results
+        except Exception as e:
+            logger.error(f"Error creating documents: {e}")
+            return results
+    
+    @staticmethod
+    def _insert_text_requests(content: str) -> List[Dict[str, Any]]:
+        """Build the batchUpdate requests that insert text at the start of a document"""
+        return [
+            {
+                'insertText': {
+                    'location': {'index': 1},
+                    'text': content
                 }
-            ]
+            }
+        ]
+    
+    async def update_document_content(self, document_id: str, content: str) -> bool:
+        """Replace the content of an existing Google Document"""
+        try:
+            if not self.docs_service:
+                await asyncio.to_thread(self.initialize_services)
+                if not self.docs_service:
+                    return False
+            
+            # Find where the body ends so the old text can be removed in the same update
+            document = await self._execute(self.docs_service.documents().get(
+                documentId=document_id,
+                fields='body(content(endIndex))'
+            ))
+            body_content = document.get('body', {}).get('content', [])
+            end_index = body_content[-1].get('endIndex', 1) if body_content else 1
+            
+            requests = []
+            # The final newline of the body cannot be deleted
+            if end_index > 2:
+                requests.append({
+                    'deleteContentRange': {
+                        'range': {'startIndex': 1, 'endIndex': end_index - 1}
+                    }
+                })
+            if content:
+                requests.extend(self._insert_text_requests(content))
+            
+            if not requests:
+                return True
             
-            self.docs_service.documents().batchUpdate(
+            await self._execute(self.docs_service.documents().batchUpdate(
                 documentId=document_id,
                 body={'requests': requests}
-            ).execute()
+            ))
             
             logger.info(f"Updated document: {document_id}")
             return True
@@ -97,23 +189,36 @@ class GoogleDocsService(GoogleClassroomService):
             logger.error(f"Error updating document: {e}")
             return False
     
-    def get_document_content(self, document_id: str) -> Optional[str]:
+    async def get_document_content(self, document_id: str) -> Optional[str]:
         """Get content from a Google Document"""
         try:
             if not self.docs_service:
-                return None
+                await asyncio.to_thread(self.initialize_services)
+                if not self.docs_service:
+                    return None
             
-            document = self.docs_service.documents().get(
-                documentId=document_id
-            ).execute()
+            # A revision-only read is much cheaper than the full body
+            cached = self._content_cache.get(document_id)
+            if cached is not None:
+                revision = await self._execute(self.docs_service.documents().get(
+                    documentId=document_id,
+                    fields='revisionId'
+                ))
+                if revision.get('revisionId') == cached[0]:
+                    return cached[1]
             
-            content = ""
-            for element in document.get('body', {}).get('content', []):
-                if 'paragraph' in element:
-                    for paragraph_element in element['paragraph']['elements']:
-                        if 'textRun' in paragraph_element:
-                            content += paragraph_element['textRun']['content']
+            document = await self._execute(self.docs_service.documents().get(
+                documentId=document_id,
+                fields=_DOCUMENT_TEXT_FIELDS
+            ))
             
+            content = "".join(
+                paragraph_element['textRun'].get('content', '')
+                for element in document.get('body', {}).get('content', [])
+                for paragraph_element in element.get('paragraph', {}).get('elements', [])
+                if 'textRun' in paragraph_element
+            )
+            self._content_cache[document_id] = (document.get('revisionId'), content)
             return content
             
         except HttpError as error:
@@ -123,17 +228,18 @@ class GoogleDocsService(GoogleClassroomService):
             logger.error(f"Error getting document content: {e}")
             return None
     
-    def create_presentation(self, title: str) -> Optional[Dict[str, Any]]:
+    async def create_presentation(self, title: str) -> Optional[Dict[str, Any]]:
         """Create a new Google Slides presentation"""
         try:
             if not self.slides_service:
-                self.initialize_services()
+                await asyncio.to_thread(self.initialize_services)
                 if not self.slides_service:
                     return None
             
-            presentation = self.slides_service.presentations().create(
-                body={'title': title}
-            ).execute()
+            presentation = await self._execute(self.slides_service.presentations().create(
+                body={'title': title},
+                fields=_CREATED_PRESENTATION_FIELDS
+            ))
             
             logger.info(f"Created presentation: {title} (ID: {presentation['presentationId']})")
             return presentation
@@ -145,11 +251,13 @@ class GoogleDocsService(GoogleClassroomService):
             logger.error(f"Error creating presentation: {e}")
             return None
     
-    def add_slide(self, presentation_id: str, slide_layout: str = 'BLANK') -> bool:
+    async def add_slide(self, presentation_id: str, slide_layout: str = 'BLANK') -> bool:
         """Add a slide to a presentation"""
         try:
             if not self.slides_service:
-                return False
+                await asyncio.to_thread(self.initialize_services)
+                if not self.slides_service:
+                    return False
             
             requests = [
                 {
@@ -161,10 +269,10 @@ class GoogleDocsService(GoogleClassroomService):
                 }
             ]
             
-            self.slides_service.presentations().batchUpdate(
+            await self._execute(self.slides_service.presentations().batchUpdate(
                 presentationId=presentation_id,
                 body={'requests': requests}
-            ).execute()
+            ))
             
             return True
             
@@ -175,11 +283,11 @@ class GoogleDocsService(GoogleClassroomService):
             logger.error(f"Error adding slide: {e}")
             return False
     
-    def share_document(self, document_id: str, email: str, role: str = 'writer') -> bool:
-        """Share a document with specific email"""
+    async def share_document(self, document_id: str, email: str, role: str = 'writer', notify: bool = True) -> bool:
+        """Share a document with specific email, emailing them about it unless notify is False"""
         try:
             if not self.drive_service:
-                self.initialize_services()
+                await asyncio.to_thread(self.initialize_services)
                 if not self.drive_service:
                     return False
             
@@ -189,11 +297,12 @@ class GoogleDocsService(GoogleClassroomService):
                 'emailAddress': email
             }
             
-            self.drive_service.permissions().create(
+            await self._execute(self.drive_service.permissions().create(
                 fileId=document_id,
                 body=permission,
-                fields='id'
-            ).execute()
+                fields='id',
+                sendNotificationEmail=notify
+            ))
             
             logger.info(f"Shared document {document_id} with {email}")
             return True
@@ -204,3 +313,58 @@ class GoogleDocsService(GoogleClassroomService):
         except Exception as e:
             logger.error(f"Error sharing document: {e}")
             return False
+    
+    async def share_document_bulk(self, document_id: str, emails: List[str], role: str = 'writer',
+                                  notify: bool = True) -> Dict[str, bool]:
+        """
+        Share a document with several emails using batched API requests
+        
+        Args:
+            document_id: The document to share
+            emails: Email addresses to grant access to
+            role: Permission role for every email
+            notify: Whether Drive emails each person about the share, as in share_document
+            
+        Returns:
+            Whether sharing succeeded, keyed by email
+        """
+        results = dict.fromkeys(emails, False)
+        try:
+            if not self.drive_service:
+                await asyncio.to_thread(self.initialize_services)
+                if not self.drive_service:
+                    return results
+            
+            def handle_share(request_id, response, exception):
+                if exception is not None:
+                    logger.error(f"Google Drive API error sharing with {emails[int(request_id)]}: {exception}")
+                    return
+                results[emails[int(request_id)]] = True
+            
+            await self._execute_batched(
+                self.drive_service,
+                handle_share,
+                [
+                    (str(index), self.drive_service.permissions().create(
+                        fileId=document_id,
+                        body={
+                            'type': 'user',
+                            'role': role,
+                            'emailAddress': email
+                        },
+                        fields='id',
+                        sendNotificationEmail=notify
+                    ))
+                    for index, email in enumerate(emails)
+                ]
+            )
+            
+            logger.info(f"Shared document {document_id} with {sum(results.values())} of {len(emails)} emails")
+            return results
+            
+        except HttpError as error:
+            logger.error(f"Google Drive batch API error: {error}")
+            return results
+        except Exception as e:
+            logger.error(f"Error sharing document: {e}")
+            return results
@@ -1,22 +1,172 @@
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from src.services.clever import CleverService
 import asyncio
+from cachetools import TTLCache
 from typing import List, Dict, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Assignment containers, highest priority first
+_ASSIGNMENT_SELECTORS = (
+    '.assignment',
+    '.task',
+    '.homework',
+    '[class*="assignment"]',
+    '[class*="task"]',
+    '[class*="homework"]',
+    '.activity-item',
+    '.work-item'
+)
+
+# Course material containers
+_MATERIAL_SELECTORS = (
+    '.chapter',
+    '.lesson',
+    '.material',
+    '.resource',
+    '[class*="chapter"]',
+    '[class*="lesson"]'
+)
+
+# Identifies what the assignment list currently shows: the URL plus an FNV-1a hash of the
+# assignment containers' text (or the body text on table-only pages), computed in the page
+_PAGE_FINGERPRINT_JS = '''(assignmentSelectors) => {
+    const elements = document.querySelectorAll(assignmentSelectors.join(', '));
+    const text = elements.length
+        ? Array.from(elements, element => element.innerText).join(' ')
+        : (document.body?.innerText || '');
+    let hash = 0x811c9dc5;
+    for (let i = 0; i < text.length; i++) {
+        hash = Math.imul(hash ^ text.charCodeAt(i), 0x01000193);
+    }
+    return location.href + '#' + (hash >>> 0).toString(16) + ':' + text.length;
+}'''
+
+# Scrapes the requested parts of the current page in a single evaluate round-trip
+_PAGE_SCRAPE_JS = '''({parts, assignmentSelectors, materialSelectors}) => {
+    const scrapeAssignments = () => {
+        const assignments = [];
+        
+        // Strategy 1: Look for assignment cards or list items
+        // Walk the DOM once, bucketing elements by the highest-priority selector they match
+        const buckets = assignmentSelectors.map(() => []);
+        for (const element of document.querySelectorAll(assignmentSelectors.join(', '))) {
+            buckets[assignmentSelectors.findIndex(selector => element.matches(selector))].push(element);
+        }
+        
+        for (const elements of buckets) {
+            for (const element of elements) {
+                const titleElement = element.querySelector('.title, h3, h4, [class*="title"], [class*="name"]');
+                const dueDateElement = element.querySelector('.due-date, .date, [class*="due"], [class*="date"]');
+                const statusElement = element.querySelector('.status, .state, [class*="status"]');
+                const linkElement = element.querySelector('a');
+                
+                if (titleElement) {
+                    assignments.push({
+                        title: titleElement.innerText?.trim() || '',
+                        due_date: dueDateElement?.innerText?.trim() || '',
+                        status: statusElement?.innerText?.trim() || 'Assigned',
+                        link: linkElement?.href || '',
+                        platform: 'McGraw Hill'
+                    });
+                }
+            }
+            
+            if (assignments.length > 0) break;
+        }
+        
+        // Strategy 2: Look for table rows
+        if (assignments.length === 0) {
+            const rows = document.querySelectorAll('tr');
+            for (const row of rows) {
+                const cells = row.querySelectorAll('td');
+                if (cells.length >= 2) {
+                    const titleCell = cells[0];
+                    const dateCell = cells[1];
+                    const link = titleCell.querySelector('a');
+                    
+                    if (titleCell.innerText?.trim() && !titleCell.innerText.trim().match(/^(title|name|assignment)$/i)) {
+                        assignments.push({
+                            title: titleCell.innerText.trim(),
+                            due_date: dateCell.innerText?.trim() || '',
+                            status: 'Assigned',
+                            link: link?.href || '',
+                            platform: 'McGraw Hill'
+                        });
+                    }
+                }
+            }
+        }
+        
+        // Drop empty titles and duplicates before serializing back to Python
+        const unique = new Map();
+        for (const assignment of assignments) {
+            if (assignment.title && !unique.has(assignment.title)) {
+                unique.set(assignment.title, assignment);
+            }
+        }
+        return [...unique.values()];
+    };
+    
+    const scrapeMaterials = () => {
+        const materials = [];
+        
+        // Same single walk as for assignments; each element lands in one bucket, so none repeat
+        const buckets = materialSelectors.map(() => []);
+        for (const element of document.querySelectorAll(materialSelectors.join(', '))) {
+            buckets[materialSelectors.findIndex(selector => element.matches(selector))].push(element);
+        }
+        
+        for (const elements of buckets) {
+            for (const element of elements) {
+                const titleElement = element.querySelector('.title, h3, h4, [class*="title"]');
+                const descriptionElement = element.querySelector('.description, [class*="description"]');
+                const linkElement = element.querySelector('a');
+                
+                if (titleElement) {
+                    materials.push({
+                        title: titleElement.innerText?.trim() || '',
+                        description: descriptionElement?.innerText?.trim() || '',
+                        link: linkElement?.href || '',
+                        type: 'material'
+                    });
+                }
+            }
+        }
+        
+        return materials;
+    };
+    
+    const result = {};
+    if (parts.includes('assignments')) {
+        result.assignments = scrapeAssignments();
+        result.fingerprint = (''' + _PAGE_FINGERPRINT_JS + ''')(assignmentSelectors);
+    }
+    if (parts.includes('materials')) result.materials = scrapeMaterials();
+    return result;
+}'''
+
 class McGrawHillService(CleverService):
     def __init__(self):
         super().__init__()
         self.mcgraw_hill_loaded = False
+        # Scraped assignments keyed by page fingerprint, so repeat calls skip the wait and scrape
+        # until the page navigates or its assignment list changes
+        self._assignments_cache = TTLCache(maxsize=32, ttl=600)
     
     async def navigate_to_mcgraw_hill(self) -> bool:
         """Navigate to McGraw Hill through Clever"""
         try:
             success = await self.launch_application('mcgraw hill')
             if success:
-                # Wait for McGraw Hill to load completely
-                await self.page.wait_for_timeout(10000)
+                try:
+                    await self.page.wait_for_url(
+                        lambda url: 'mheducation.com' in url or 'connected.mcgraw-hill.com' in url,
+                        timeout=15000
+                    )
+                except PlaywrightTimeoutError:
+                    logger.warning("Timed out waiting for McGraw Hill to load")
                 
                 # Check if we're on a McGraw Hill page
                 current_url = self.page.url
@@ -25,9 +175,11 @@ class McGrawHillService(CleverService):
                     logger.info("Successfully navigated to McGraw Hill")
                     return True
                 else:
-                    # Try to detect McGraw Hill by page content
-                    page_content = await self.page.content()
-                    if any(keyword in page_content.lower() for keyword in ['mcgraw', 'mheducation', 'connected']):
+                    # Try to detect McGraw Hill in the page itself, without serializing the whole DOM;
+                    # branding sits near the top, so only the start of the body text is checked
+                    if await self.page.evaluate(
+                        '() => /mcgraw|mheducation|connected/i.test(document.title + " " + (document.body?.innerText || "").slice(0, 4096))'
+                    ):
                         self.mcgraw_hill_loaded = True
                         return True
             
@@ -43,84 +195,20 @@ class McGrawHillService(CleverService):
             if not self.mcgraw_hill_loaded and not await self.navigate_to_mcgraw_hill():
                 return []
             
-            # Wait for assignments to load
-            await self.page.wait_for_timeout(5000)
+            fingerprint = await self.page.evaluate(_PAGE_FINGERPRINT_JS, list(_ASSIGNMENT_SELECTORS))
+            cached = self._assignments_cache.get(fingerprint)
+            if cached is not None:
+                logger.info(f"Returning {len(cached)} cached McGraw Hill assignments")
+                return list(cached)
             
-            # Try multiple strategies to find assignments
-            assignments = await self.page.evaluate('''() => {
-                const assignments = [];
-                
-                // Strategy 1: Look for assignment cards or list items
-                const assignmentSelectors = [
-                    '.assignment',
-                    '.task',
-                    '.homework',
-                    '[class*="assignment"]',
-                    '[class*="task"]',
-                    '[class*="homework"]',
-                    '.activity-item',
-                    '.work-item'
-                ];
-                
-                for (const selector of assignmentSelectors) {
-                    const elements = document.querySelectorAll(selector);
-                    for (const element of elements) {
-                        const titleElement = element.querySelector('.title, h3, h4, [class*="title"], [class*="name"]');
-                        const dueDateElement = element.querySelector('.due-date, .date, [class*="due"], [class*="date"]');
-                        const statusElement = element.querySelector('.status, .state, [class*="status"]');
-                        const linkElement = element.querySelector('a');
-                        
-                        if (titleElement) {
-                            assignments.push({
-                                title: titleElement.innerText?.trim() || '',
-                                due_date: dueDateElement?.innerText?.trim() || '',
-                                status: statusElement?.innerText?.trim() || 'Assigned',
-                                link: linkElement?.href || '',
-                                platform: 'McGraw Hill'
-                            });
-                        }
-                    }
-                    
-                    if (assignments.length > 0) break;
-                }
-                
-                // Strategy 2: Look for table rows
-                if (assignments.length === 0) {
-                    const rows = document.querySelectorAll('tr');
-                    for (const row of rows) {
-                        const cells = row.querySelectorAll('td');
-                        if (cells.length >= 2) {
-                            const titleCell = cells[0];
-                            const dateCell = cells[1];
-                            const link = titleCell.querySelector('a');
-                            
-                            if (titleCell.innerText?.trim() && !titleCell.innerText.trim().match(/^(title|name|assignment)$/i)) {
-                                assignments.push({
-                                    title: titleCell.innerText.trim(),
-                                    due_date: dateCell.innerText?.trim() || '',
-                                    status: 'Assigned',
-                                    link: link?.href || '',
-                                    platform: 'McGraw Hill'
-                                });
-                            }
-                        }
-                    }
-                }
-                
-                return assignments;
-            }''')
+            await self._wait_for_assignments()
             
-            # Filter out empty titles and duplicates
-            seen_titles = set()
-            unique_assignments = []
+            data = await self._scrape_page('assignments')
+            assignments = data['assignments']
             
-            for assignment in assignments:
-                if assignment.get('title') and assignment['title'] not in seen_titles:
-                    seen_titles.add(assignment['title'])
-                    unique_assignments.append(assignment)
-            
-            logger.info(f"Found {len(unique_assignments)} McGraw Hill assignments")
-            return unique_assignments
+            logger.info(f"Found {len(assignments)} McGraw Hill assignments")
+            self._assignments_cache[data['fingerprint']] = assignments
+            return list(assignments)
             
         except Exception as e:
             logger.error(f"Error getting McGraw Hill assignments: {e}")
@@ -132,6 +220,8 @@ class McGrawHillService(CleverService):
             if not self.mcgraw_hill_loaded and not await self.navigate_to_mcgraw_hill():
                 return False
             
+            # Completing work changes assignment status, so rescrape next time
+            self._assignments_cache.clear()
             logger.info(f"Attempting to complete McGraw Hill assignment: {assignment_title}")
             # Note: Actual implementation would require specific knowledge of
             # McGraw Hill's interface and should be used responsibly
@@ -148,40 +238,44 @@ class McGrawHillService(CleverService):
             if not self.mcgraw_hill_loaded and not await self.navigate_to_mcgraw_hill():
                 return []
             
-            materials = await self.page.evaluate('''() => {
-                const materials = [];
-                const materialSelectors = [
-                    '.chapter',
-                    '.lesson',
-                    '.material',
-                    '.resource',
-                    '[class*="chapter"]',
-                    '[class*="lesson"]'
-                ];
-                
-                for (const selector of materialSelectors) {
-                    const elements = document.querySelectorAll(selector);
-                    for (const element of elements) {
-                        const titleElement = element.querySelector('.title, h3, h4, [class*="title"]');
-                        const descriptionElement = element.querySelector('.description, [class*="description"]');
-                        const linkElement = element.querySelector('a');
-                        
-                        if (titleElement) {
-                            materials.push({
-                                title: titleElement.innerText?.trim() || '',
-                                description: descriptionElement?.innerText?.trim() || '',
-                                link: linkElement?.href || '',
-                                type: 'material'
-                            });
-                        }
-                    }
-                }
-                
-                return materials;
-            }''')
-            
-            return materials
+            return (await self._scrape_page('materials'))['materials']
             
         except Exception as e:
             logger.error(f"Error getting course materials: {e}")
             return []
+    
+    async def get_assignments_and_materials(self) -> Dict[str, List[Dict]]:
+        """Get assignments and course materials from McGraw Hill in one page scrape"""
+        try:
+            if not self.mcgraw_hill_loaded and not await self.navigate_to_mcgraw_hill():
+                return {'assignments': [], 'materials': []}
+            
+            await self._wait_for_assignments()
+            
+            data = await self._scrape_page('assignments', 'materials')
+            self._assignments_cache[data.pop('fingerprint')] = data['assignments']
+            data['assignments'] = list(data['assignments'])
+            return data
+            
+        except Exception as e:
+            logger.error(f"Error getting McGraw Hill page data: {e}")
+            return {'assignments': [], 'materials': []}
+    
+    async def _wait_for_assignments(self) -> None:
+        """Wait for the assignment list, or for the page to settle, instead of a fixed sleep"""
+        if await self._wait_for_selector(', '.join(_ASSIGNMENT_SELECTORS)):
+            return
+        # Table-only pages match no card selector; scrape whatever has loaded even if the
+        # network never goes idle
+        try:
+            await self.page.wait_for_load_state('networkidle', timeout=10000)
+        except PlaywrightTimeoutError:
+            pass
+    
+    async def _scrape_page(self, *parts: str) -> Dict[str, List[Dict]]:
+        """Run the page scrape for the given parts ('assignments', 'materials')"""
+        return await self.page.evaluate(_PAGE_SCRAPE_JS, {
+            'parts': list(parts),
+            'assignmentSelectors': list(_ASSIGNMENT_SELECTORS),
+            'materialSelectors': list(_MATERIAL_SELECTORS)
+        })
@@ -1,7 +1,10 @@
 import pytest
-from unittest.mock import Mock, patch
-from src.ai.assistant import AIAssistant
+from unittest.mock import AsyncMock, MagicMock, patch
+import time
+from src.ai import assistant as assistant_module
+from src.ai.assistant import AIAssistant, PromptTooLongError, ensure_token_encoding
 from src.config.settings import settings
+from src.models.schemas import AnalysisRequest
 
 class TestAIAssistant:
     @pytest.fixture
@@ -12,36 +15,158 @@ class TestAIAssistant:
         # Test that assistant initializes (may not have API key in test env)
         assert ai_assistant is not None
     
-    @patch('src.ai.assistant.OpenAI')
-    def test_analyze_assignment_with_mock(self, mock_openai, ai_assistant):
+    @pytest.mark.asyncio
+    @patch('src.ai.assistant.AsyncOpenAI')
+    async def test_analyze_assignment_with_mock(self, mock_openai, ai_assistant):
         # Mock OpenAI response
-        mock_response = Mock()
+        mock_response = MagicMock()
         mock_response.choices[0].message.content = '{"KEY_CONCEPTS": ["test"], "LEARNING_OBJECTIVES": "test"}'
-        mock_openai.return_value.chat.completions.create.return_value = mock_response
+        mock_openai.return_value.chat.completions.create = AsyncMock(return_value=mock_response)
         
         # Set API key for test
         ai_assistant.is_available = True
         ai_assistant.client = mock_openai.return_value
         
-        result = ai_assistant.analyze_assignment("Test assignment")
+        result = await ai_assistant.analyze_assignment("Test assignment")
         
         assert "KEY_CONCEPTS" in result
         assert isinstance(result, dict)
     
-    def test_analyze_assignment_fallback(self, ai_assistant):
+    @pytest.mark.asyncio
+    async def test_analyze_assignment_fallback(self, ai_assistant):
         # Test fallback when AI is unavailable
         ai_assistant.is_available = False
         
-        result = ai_assistant.analyze_assignment("Test assignment")
+        result = await ai_assistant.analyze_assignment("Test assignment")
         
         assert "KEY_CONCEPTS" in result
         assert result.get("AI_UNAVAILABLE") is True
     
-    def test_help_with_question_fallback(self, ai_assistant):
+    @pytest.mark.asyncio
+    async def test_help_with_question_fallback(self, ai_assistant):
         # Test fallback for question help
         ai_assistant.is_available = False
         
-        result = ai_assistant.help_with_question("Test question")
+        result = await ai_assistant.help_with_question("Test question")
         
         assert "QUESTION_BREAKDOWN" in result
         assert result.get("AI_UNAVAILABLE") is True
+    
+    @pytest.mark.asyncio
+    async def test_analyze_assignment_uses_cache(self, ai_assistant):
+        # Identical requests should only reach OpenAI once
+        mock_response = MagicMock()
+        mock_response.choices[0].message.content = '{"KEY_CONCEPTS": ["cached"]}'
+        mock_client = MagicMock()
+        mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
+        ai_assistant.is_available = True
+        ai_assistant.client = mock_client
+        
+        first = await ai_assistant.analyze_assignment("Cached assignment", "Context")
+        second = await ai_assistant.analyze_assignment("Cached assignment", "Context")
+        
+        assert first == second
+        assert mock_client.chat.completions.create.call_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_analyze_assignments_batch_single_request(self, ai_assistant):
+        # Uncached items should share one OpenAI request and keep their order
+        mock_response = MagicMock()
+        mock_response.choices[0].message.content = (
+            '{"results": [{"KEY_CONCEPTS": ["first"]}, {"KEY_CONCEPTS": ["second"]}]}'
+        )
+        mock_client = MagicMock()
+        mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
+        ai_assistant.is_available = True
+        ai_assistant.client = mock_client
+        
+        items = [
+            AnalysisRequest(assignment_description="First batch assignment"),
+            AnalysisRequest(assignment_description="Second batch assignment")
+        ]
+        results = await ai_assistant.analyze_assignments_batch(items)
+        
+        assert [result["KEY_CONCEPTS"] for result in results] == [["first"], ["second"]]
+        assert mock_client.chat.completions.create.call_count == 1
+        # Each packed item gets its own response budget
+        assert mock_client.chat.completions.create.call_args.kwargs["max_tokens"] == 3000
+    
+    @pytest.mark.asyncio
+    async def test_analyze_assignments_batch_oversized_item_falls_back(self, ai_assistant):
+        # An item too long for the context window gets the fallback; the rest are still analyzed
+        mock_response = MagicMock()
+        mock_response.choices[0].message.content = '{"results": [{"KEY_CONCEPTS": ["short"]}]}'
+        mock_client = MagicMock()
+        mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
+        ai_assistant.is_available = True
+        ai_assistant.client = mock_client
+        
+        items = [
+            AnalysisRequest(assignment_description="Short assignment"),
+            AnalysisRequest(assignment_description="word " * (settings.AI_CONTEXT_WINDOW * 2))
+        ]
+        results = await ai_assistant.analyze_assignments_batch(items)
+        
+        assert results[0]["KEY_CONCEPTS"] == ["short"]
+        assert results[1].get("AI_UNAVAILABLE") is True
+        assert mock_client.chat.completions.create.call_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_stream_analyze_assignment(self, ai_assistant):
+        # Deltas are forwarded as they arrive and the parsed analysis is sent last
+        async def fake_stream():
+            for text in ['{"KEY_CONCEPTS": ', '["streamed"]}']:
+                chunk = MagicMock()
+                chunk.choices[0].delta.content = text
+                yield chunk
+        
+        mock_client = MagicMock()
+        mock_client.chat.completions.create = AsyncMock(return_value=fake_stream())
+        ai_assistant.is_available = True
+        ai_assistant.client = mock_client
+        
+        events = [event async for event in ai_assistant.stream_analyze_assignment("Streamed assignment")]
+        
+        assert events[0].startswith("event: delta")
+        assert events[-1] == 'event: analysis\ndata: {"KEY_CONCEPTS":["streamed"]}\n\n'
+    
+    @pytest.mark.asyncio
+    async def test_circuit_breaker_short_circuits_after_failures(self, ai_assistant):
+        # Once the breaker opens, requests fall back without calling OpenAI
+        mock_client = MagicMock()
+        mock_client.chat.completions.create = AsyncMock(side_effect=Exception("API down"))
+        ai_assistant.is_available = True
+        ai_assistant.client = mock_client
+        
+        for attempt in range(settings.AI_BREAKER_FAIL_MAX + 2):
+            result = await ai_assistant.help_with_question(f"Question {attempt}")
+            assert result.get("AI_UNAVAILABLE") is True
+        
+        assert mock_client.chat.completions.create.call_count == settings.AI_BREAKER_FAIL_MAX
+    
+    def test_max_tokens_sized_to_prompt(self, ai_assistant):
+        # Short prompts keep the cap; prompts that overflow the context window are rejected
+        short = ai_assistant._max_tokens([{"role": "user", "content": "Short question"}], 1200)
+        assert short == min(1200, settings.AI_MAX_RESPONSE_TOKENS)
+        
+        long_content = "word " * (settings.AI_CONTEXT_WINDOW * 2)
+        with pytest.raises(PromptTooLongError):
+            ai_assistant._max_tokens([{"role": "user", "content": long_content}], 1200)
+    
+    @pytest.mark.asyncio
+    async def test_token_encoding_failure_is_retried(self, monkeypatch):
+        # A failed load falls back to estimates but is attempted again after the retry pause
+        encoding = MagicMock()
+        loader = MagicMock(side_effect=[None, encoding])
+        monkeypatch.setattr(assistant_module, "_load_encoding", loader)
+        monkeypatch.setattr(assistant_module, "_encoding", None)
+        monkeypatch.setattr(assistant_module, "_encoding_attempted_at", None)
+        
+        await ensure_token_encoding()
+        await ensure_token_encoding()
+        assert loader.call_count == 1
+        
+        assistant_module._encoding_attempted_at = time.monotonic() - assistant_module._ENCODING_RETRY_SECONDS
+        await ensure_token_encoding()
+        assert loader.call_count == 2
+        assert assistant_module._encoding is encoding
@@ -0,0 +1,28 @@
+from datetime import datetime
+from src.utils.helpers import format_assignment_due_date, calculate_time_remaining
+
+class TestDueDates:
+    def test_format_known_formats(self):
+        expected = "March 05, 2024 at 12:00 AM"
+        assert format_assignment_due_date("2024-03-05") == expected
+        assert format_assignment_due_date("3/5/2024") == expected
+        assert format_assignment_due_date("2024-03-05T00:00:00") == expected
+        assert format_assignment_due_date("2024-03-05 00:00:00") == expected
+        assert format_assignment_due_date("2024-03-05T00:00:00Z") == expected
+    
+    def test_format_unpadded_dates_and_times(self):
+        # strptime accepts single-digit fields, so the shape checks must too
+        assert format_assignment_due_date("2024-3-5") == "March 05, 2024 at 12:00 AM"
+        assert format_assignment_due_date("2024-03-05 9:30:00") == "March 05, 2024 at 09:30 AM"
+        assert format_assignment_due_date("2024-3-5 9:5:7") == "March 05, 2024 at 09:05 AM"
+    
+    def test_format_unknown_returns_original(self):
+        assert format_assignment_due_date("Tomorrow") == "Tomorrow"
+        assert format_assignment_due_date("") == "No due date"
+    
+    def test_time_remaining(self):
+        assert calculate_time_remaining("2000-01-01") == "Overdue"
+        assert calculate_time_remaining("next week") == "Unknown"
+        assert calculate_time_remaining("2000-1-15 9:30:00") == "Overdue"
+        future = datetime(datetime.now().year + 2, 1, 1).strftime('%m/%d/%Y')
+        assert "days" in calculate_time_remaining(future)
@@ -1,27 +1,57 @@
+import atexit
 import logging
+import queue
 import os
-import json
+import orjson
+import re
+import tempfile
 from datetime import datetime
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from typing import Dict, Any, Optional
 from src.config.settings import settings
 
+_log_listener: Optional[QueueListener] = None
+
 def setup_logging(level: int = logging.INFO) -> None:
-    """Setup logging configuration"""
-    logging.basicConfig(
-        level=level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler('edu_ai_assistant.log')
-        ]
-    )
+    """Setup logging configuration, writing records from a background thread"""
+    global _log_listener
+    if _log_listener is not None:
+        return
+    
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handlers = [
+        logging.StreamHandler(),
+        RotatingFileHandler('edu_ai_assistant.log', maxBytes=10_000_000, backupCount=5)
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    # Callers only enqueue records; the listener thread does the blocking I/O
+    log_queue = queue.Queue(-1)
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(QueueHandler(log_queue))
+    _log_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
 
 def validate_credentials() -> Dict[str, bool]:
     """Validate that all required credentials are available"""
+    # Settings are frozen, so only the client secret file can change while running
+    try:
+        mtime = os.path.getmtime(settings.GOOGLE_CLIENT_SECRET_FILE)
+    except OSError:
+        mtime = -1.0
+    return dict(_validate_credentials(mtime))
+
+@lru_cache(maxsize=4)
+def _validate_credentials(secret_file_mtime: float) -> Dict[str, bool]:
+    """Build the credential report for one version of the client secret file"""
     validation = {}
     
     # Check Google credentials
-    validation['google_credentials'] = os.path.exists(settings.GOOGLE_CLIENT_SECRET_FILE)
+    validation['google_credentials'] = secret_file_mtime >= 0
     
     # Check AI credentials
     validation['ai_credentials'] = bool(settings.OPENAI_API_KEY)
@@ -50,7 +80,7 @@ def format_timestamp(timestamp: Optional[str] = None) -> str:
         try:
             # Try to parse various timestamp formats
             if 'T' in timestamp:
-                dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+                dt = datetime.fromisoformat(timestamp)
             else:
                 dt = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S')
             return dt.strftime('%Y-%m-%d %H:%M:%S')
@@ -61,45 +91,57 @@ def format_timestamp(timestamp: Optional[str] = None) -> str:
 def safe_json_loads(json_string: str, default: Any = None) -> Any:
     """Safely parse JSON string with fallback"""
     try:
-        return json.loads(json_string)
-    except (json.JSONDecodeError, TypeError):
+        return orjson.loads(json_string)
+    except orjson.JSONDecodeError:
         return default
 
+# Maps every character that is invalid in a filename to an underscore
+_FILENAME_TABLE = str.maketrans(dict.fromkeys('<>:"/\\|?*', '_'))
+
+_SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+
+# Cheap shape checks that pick the single parser for a due date string
+_ISO_RE = re.compile(r'^\d{4}-\d{2}-\d{2}T')
+_DATETIME_RE = re.compile(r'^\d{4}-\d{1,2}-\d{1,2} \d{1,2}:\d{1,2}:\d{1,2}$')
+_DASH_RE = re.compile(r'^\d{4}-\d{1,2}-\d{1,2}$')
+_SLASH_RE = re.compile(r'^\d{1,2}/\d{1,2}/\d{4}$')
+
+def _parse_due(due_date_str: str) -> Optional[datetime]:
+    """Parse a due date string, or return None if it has no known format"""
+    try:
+        if _ISO_RE.match(due_date_str):
+            return datetime.fromisoformat(due_date_str)
+        if _DATETIME_RE.match(due_date_str):
+            return datetime.strptime(due_date_str, '%Y-%m-%d %H:%M:%S')
+        if _DASH_RE.match(due_date_str):
+            return datetime.strptime(due_date_str, '%Y-%m-%d')
+        if _SLASH_RE.match(due_date_str):
+            return datetime.strptime(due_date_str, '%m/%d/%Y')
+    except ValueError:
+        pass
+    return None
+
 def format_assignment_due_date(due_date_str: str) -> str:
     """Format assignment due date for display"""
     if not due_date_str:
         return "No due date"
     
-    try:
-        # Handle various date formats
-        if 'T' in due_date_str:
-            dt = datetime.fromisoformat(due_date_str.replace('Z', '+00:00'))
-        else:
-            # Try common date formats
-            for fmt in ['%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%m/%d/%Y']:
-                try:
-                    dt = datetime.strptime(due_date_str, fmt)
-                    break
-                except ValueError:
-                    continue
-            else:
-                return due_date_str  # Return original if no format matches
-        
-        return dt.strftime('%B %d, %Y at %I:%M %p')
-    except (ValueError, TypeError):
-        return due_date_str
+    dt = _parse_due(due_date_str)
+    if dt is None:
+        return due_date_str  # Return original if no format matches
+    
+    return dt.strftime('%B %d, %Y at %I:%M %p')
 
 def calculate_time_remaining(due_date_str: str) -> str:
     """Calculate time remaining until due date"""
     if not due_date_str:
         return "No due date"
     
+    due_date = _parse_due(due_date_str)
+    if due_date is None:
+        return "Unknown"
+    
     try:
-        if 'T' in due_date_str:
-            due_date = datetime.fromisoformat(due_date_str.replace('Z', '+00:00'))
-        else:
-            due_date = datetime.strptime(due_date_str, '%Y-%m-%d %H:%M:%S')
-        
         now = datetime.now()
         time_diff = due_date - now
         
@@ -121,17 +163,30 @@ def calculate_time_remaining(due_date_str: str) -> str:
     except (ValueError, TypeError):
         return "Unknown"
 
+def write_file_atomic(path: str, content: str) -> None:
+    """Replace a file's contents so concurrent readers and writers never see a partial file"""
+    # A unique temp file per writer, in the same directory so os.replace stays atomic
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)),
+        prefix=f".{os.path.basename(path)}.",
+        suffix='.tmp'
+    )
+    try:
+        with os.fdopen(fd, 'w') as tmp_file:
+            tmp_file.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
 def sanitize_filename(filename: str) -> str:
     """Sanitize filename to remove invalid characters"""
-    invalid_chars = '<>:"/\\|?*'
-    for char in invalid_chars:
-        filename = filename.replace(char, '_')
-    return filename[:255]  # Limit length
+    return filename.translate(_FILENAME_TABLE)[:255]  # Limit length
 
 def format_file_size(size_bytes: int) -> str:
     """Format file size in human-readable format"""
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if size_bytes < 1024.0:
-            return f"{size_bytes:.2f} {unit}"
-        size_bytes /= 1024.0
-    return f"{size_bytes:.2f} TB"
+    # Each unit is 2**10 of the previous one, so the bit length picks it directly
+    index = 0
+    if size_bytes >= 1:
+        index = min((int(size_bytes).bit_length() - 1) // 10, len(_SIZE_UNITS) - 1)
+    return f"{size_bytes / (1 << (index * 10)):.2f} {_SIZE_UNITS[index]}"